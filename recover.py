@@ -1,19 +1,37 @@
-import pandas as pd
 import sqlite3
+from pathlib import Path
 
-# Read your current data
-df = pd.read_csv('data/csv/parts_master.csv')
+from scraper import config
 
-# Group by vehicle to see the pattern
-vehicles = df['vehicle_name'].unique()
+# Read your current data straight from the checkpoint DB (read-only; a scrape may be running)
+con = sqlite3.connect(f"{Path(config.SQLITE_PATH).resolve().as_uri()}?mode=ro",
+                      uri=True)
+
+# Vehicles in the order their parts were first written, named as their parts rows were.
+# Rows written before parts.vehicle_name was filled have it blank; those fall back to
+# vehicles (LEFT JOIN, so parts without a vehicles row are still listed).
+vehicles = con.execute("""
+    SELECT p.vehicle_id,
+           COALESCE(NULLIF(MAX(p.vehicle_name), ''), v.vehicle_name, p.vehicle_id)
+    FROM parts p LEFT JOIN vehicles v ON v.vehicle_id = p.vehicle_id
+    GROUP BY p.vehicle_id
+    ORDER BY MIN(p.rowid)
+""").fetchall()
 print("Vehicles found:", len(vehicles))
 
 # Check if data for vehicle N actually belongs to vehicle N-1
-for i, vehicle in enumerate(vehicles[1:], 1):  # Skip first vehicle
-    current_data = df[df['vehicle_name'] == vehicle]
-    prev_vehicle = vehicles[i - 1]
+for i, ((_, prev_vehicle), (vehicle_id, vehicle)) in enumerate(
+        zip(vehicles, vehicles[1:]), 1):
+    # Covered by parts_group_order (vehicle_id prefix); stops at the 5th distinct code
+    codes = [
+        code for (code, ) in con.execute(
+            "SELECT DISTINCT group_code FROM parts WHERE vehicle_id=? LIMIT 5",
+            (vehicle_id, ))
+    ]
 
     print(f"\nVehicle {i}: {vehicle}")
     print(f"Previous: {prev_vehicle}")
-    print(f"Group codes in current: {current_data['group_code'].unique()[:5]}")
+    print(f"Group codes in current: {codes}")
     # You should see group codes that don't match the current vehicle
+
+con.close()
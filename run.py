@@ -4,7 +4,7 @@ CLI entrypoint for the Hero e-catalogue scraper.
 
 Usage examples:
   python run.py --catalog-url "https://ecatalogue.heromotocorp.biz/sol_dealer/dealer/" 
-  python run.py --catalog-url "https://..." --no-headless --force --parquet --log-level DEBUG
+  python run.py --catalog-url "https://..." --no-headless --force --csv --log-level DEBUG
 """
 
 import argparse
@@ -13,7 +13,6 @@ import logging
 import os
 import sys
 from typing import Optional
-from pathlib import Path
 
 # Ensure package imports work when running as a script
 # (repo layout: hero_scraper/ with scraper/ package and this run.py)
@@ -81,12 +80,19 @@ def parse_args() -> argparse.Namespace:
         default=False,
         help="Reprocess groups even if checkpoint says 'done'.",
     )
+    parser.add_argument(
+        "--csv",
+        dest="csv",
+        action="store_true",
+        default=False,
+        help="In addition to Parquet, also write a CSV file for parts.",
+    )
     parser.add_argument(
         "--parquet",
         dest="parquet",
         action="store_true",
-        default=False,
-        help="In addition to CSV, also write a Parquet file for parts.",
+        default=True,
+        help="Kept for backwards compatibility; Parquet is always written.",
     )
     parser.add_argument(
         "--log-level",
@@ -112,29 +118,17 @@ async def _amain(args: argparse.Namespace) -> None:
     # Apply runtime config overrides
     config.HEADLESS = bool(args.headless)
     if args.output_dir:
-        # If your config.py exposes OUTPUT_DIR and ensure_directories() uses it, set it here:
-        try:
-            config.OUTPUT_DIR = Path(args.output_dir)
-            # Recompute derived paths to stay consistent with new OUTPUT_DIR
-            try:
-                config.CSV_OUTPUT = config.OUTPUT_DIR / "csv" / "parts_master.csv"
-                config.PARQUET_OUTPUT = config.OUTPUT_DIR / "parquet" / "parts_master.parquet"
-                config.SQLITE_PATH = config.OUTPUT_DIR / "sqlite" / "hero_catalogue.sqlite"
-                config.IMAGES_DIR = config.OUTPUT_DIR / "images"
-            except Exception:
-                # If these attributes don't exist in config, ignore
-                pass
-        except Exception:
-            pass
+        config.set_output_dir(args.output_dir)
 
     _setup_logging(args.log_level, args.log_file or None)
 
     logging.getLogger(__name__).info(
-        f"Headless={config.HEADLESS} | Force={args.force} | Parquet={args.parquet}"
+        f"Headless={config.HEADLESS} | Force={args.force} | CSV={args.csv}"
     )
 
     pipeline = ScrapingPipeline(force_reprocess=args.force,
-                                save_parquet=args.parquet)
+                                save_parquet=True,
+                                write_csv=args.csv)
     await pipeline.run(args.catalog_url)
 
 
@@ -1,137 +1,162 @@
 # scraper/aggregates.py
 """Aggregates scraper - extracts Engine and Frame groups for each vehicle (robust & per-row typing)."""
+import asyncio
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 
+import orjson
 from playwright.async_api import Page, TimeoutError as PWTimeoutError
 
+from . import config
 from .datamodel import Vehicle, TableIndex
-from .browser import wait_for_selector_any, wait_for_datatables, evaluate
+from .browser import PagePool, wait_for_selector_any, wait_for_datatables, evaluate
 
 logger = logging.getLogger(__name__)
 MODEL_READY_TIMEOUT = 45_000
 
-# --- Ensure DataTables returns ALL rows (not just 25) ---
-PREPARE_SHOW_ALL_JS = """
-() => new Promise(resolve => {
-  const $ = window.jQuery || window.$;
-  if (!($ && $.fn && $.fn.DataTable)) { resolve(false); return; }
-  const ids = ['#DataTables_Table_0', '#DataTables_Table_1', '#DataTables_Table_2', '#DataTables_Table_3'];
-  let pending = 0;
-  const done = () => { if (--pending <= 0) resolve(true); };
-
-  ids.forEach(sel => {
-    try {
-      const dt = $(sel).DataTable();
-      if (dt) {
-        pending++;
-        dt.one('draw.dt', () => setTimeout(done, 50));
-        // -1 => "All" (client-side tables). If UI lacks "All", API still accepts it and returns all rows.
-        dt.page.len(-1).draw(false);
-      }
-    } catch (e) {}
-  });
-
-  if (pending === 0) resolve(false);
-});
-"""
+# --- Page-side helpers, installed once per browser context via add_init_script ---
+# Exposes window.__hero so each evaluate() below only ships a one-line call.
+HERO_JS_BUNDLE = """
+(() => {
+  const TABLE_IDS = ['#DataTables_Table_0', '#DataTables_Table_1', '#DataTables_Table_2', '#DataTables_Table_3'];
+  // Compiled once per page and reused for every row
+  const RE_VARIANT = /updateBomDetails\\(\\s*'[^']*'\\s*,\\s*''\\s*,\\s*'([^']*)'\\s*\\)/;
+  const RE_GROUP   = /updateBomDetails\\(\\s*'([^']+)'/;
+  const RE_THUMB   = /^([^ \\t(]+)\\s*\\((.*)\\)\\s*$/;
+  // ENGINE/FRAME decided per row, using the row's own tokens (null => caller's table hint)
+  const groupType = (table_no, group_code) => {
+    const tnU = (table_no || '').trim().toUpperCase();
+    const gcU = (group_code || '').trim().toUpperCase();
+    if (tnU.startsWith('E-') || gcU.startsWith('E-')) return 'ENGINE';
+    if (tnU.startsWith('F-') || gcU.startsWith('F-')) return 'FRAME';
+    return null;
+  };
+  const jq = () => {
+    const $ = window.jQuery || window.$;
+    return ($ && $.fn && $.fn.DataTable) ? $ : null;
+  };
 
-# --- (Optional) quick info for debugging counts/length ---
-COUNTS_INFO_JS = """
-() => {
-  const $ = window.jQuery || window.$;
-  if (!($ && $.fn && $.fn.DataTable)) return {};
-  const probe = sel => {
-    try {
-      const dt = $(sel).DataTable();
-      if (!dt) return null;
-      const info = dt.page.info();
-      return { recordsTotal: info.recordsTotal, recordsDisplay: info.recordsDisplay, length: info.length };
-    } catch (_) { return null; }
+  // (Optional) quick info for debugging counts/length
+  const countsInfo = () => {
+    const $ = jq();
+    if (!$) return {};
+    const probe = sel => {
+      try {
+        const dt = $(sel).DataTable();
+        if (!dt) return null;
+        const info = dt.page.info();
+        return { recordsTotal: info.recordsTotal, recordsDisplay: info.recordsDisplay, length: info.length };
+      } catch (_) { return null; }
+    };
+    const out = {};
+    TABLE_IDS.forEach(sel => { out[sel] = probe(sel); });
+    return out;
   };
-  return {
-    '#DataTables_Table_0': probe('#DataTables_Table_0'),
-    '#DataTables_Table_1': probe('#DataTables_Table_1'),
-    '#DataTables_Table_2': probe('#DataTables_Table_2'),
-    '#DataTables_Table_3': probe('#DataTables_Table_3'),
+
+  // IMPORTANT: "show all" (page.len(-1)) before reading, so every row is drawn and attached.
+  // Off-page rows are detached, and innerText on a detached node falls back to textContent,
+  // which would normalise text differently from page 1. Rows still lacking a node are skipped
+  // and reported in `undrawn`.
+  const allNodes = ($, sel, undrawn) => {
+    if (!document.querySelector(sel)) return null;
+    const dt = $(sel).DataTable();
+    if (dt.page.len() !== -1) dt.page.len(-1).draw(false);
+    const nodes = dt.rows({ search: 'applied', page: 'all' }).nodes().toArray();
+    const missing = nodes.filter(tr => !tr).length;
+    if (missing) undrawn.push({ sel, missing, rows: nodes.length });
+    return nodes.filter(Boolean);
   };
-}
-"""
 
-# --- Get ALL rows from a client-side DataTable (list view) ---
-EXTRACT_LIST_VIEW_JS = """
-(sel) => {
-  const $ = window.jQuery || window.$;
-  if (!document.querySelector(sel) || !($ && $.fn && $.fn.DataTable)) return null;
-  const dt = $(sel).DataTable();
-
-  // IMPORTANT: request ALL rows regardless of current pagination
-  const nodes = dt.rows({ search: 'applied', page: 'all' }).nodes().toArray();
-
-  return nodes.map(tr => {
-    const tds = tr.querySelectorAll('td');
-    const s_no     = (tds[0]?.innerText || '').trim();
-    const table_no = (tds[1]?.innerText || '').trim();    // usually 'E-1' / 'F-1'
-    const desc     = (tds[2]?.innerText || '').trim();
-    const group_td = tr.querySelector('td.group-no-td');
-    const group_code = group_td?.getAttribute('group-no') || '';
-    // variant can sometimes be in onclick of the table link:
-    const onclick = tds[1]?.querySelector('a')?.getAttribute('onclick') || '';
-    const vm = onclick.match(/updateBomDetails\\(\\s*'[^']*'\\s*,\\s*''\\s*,\\s*'([^']*)'\\s*\\)/);
-    const variant = vm ? vm[1] : null;
-    return { s_no, table_no, desc, group_code, variant };
-  });
-}
-"""
+  // List view: #DataTables_Table_0 (engine) / #DataTables_Table_1 (frame)
+  const listView = ($, sel, undrawn) => {
+    const nodes = allNodes($, sel, undrawn);
+    if (!nodes) return null;
+    return nodes.map(tr => {
+      const tds = tr.querySelectorAll('td');
+      const s_no     = (tds[0]?.innerText || '').trim();
+      const table_no = (tds[1]?.innerText || '').trim();    // usually 'E-1' / 'F-1'
+      const desc     = (tds[2]?.innerText || '').trim();
+      const group_td = tr.querySelector('td.group-no-td');
+      const group_code = group_td?.getAttribute('group-no') || '';
+      // variant can sometimes be in onclick of the table link:
+      const onclick = tds[1]?.querySelector('a')?.getAttribute('onclick') || '';
+      const vm = RE_VARIANT.exec(onclick);
+      const variant = vm ? vm[1] : null;
+      return { s_no, table_no, desc, group_code, variant, group_type: groupType(table_no, group_code) };
+    });
+  };
+
+  // Thumbnails view: #DataTables_Table_2 (engine) / #DataTables_Table_3 (frame)
+  const thumbnails = ($, sel, undrawn) => {
+    const nodes = allNodes($, sel, undrawn);
+    if (!nodes) return null;
+    return nodes.map(tr => {
+      const link = tr.querySelector('.panel-heading a') || tr.querySelector('.panel-heading');
+      const text = (link?.innerText || '').trim();  // e.g., "E-1 (SHROUD / FAN COVER)" or "F-1 (FRAME BODY)"
+      const m = RE_THUMB.exec(text);
+      const table_no = m ? m[1] : text;
+      const desc     = m ? m[2] : '';
+
+      const onclick = link?.getAttribute('onclick') || '';
+      const gm = RE_GROUP.exec(onclick);
+      const group_code = gm ? gm[1] : '';
+
+      const vm = RE_VARIANT.exec(onclick);
+      const variant = vm ? vm[1] : null;
+
+      return { s_no: '', table_no, desc, group_code, variant, group_type: groupType(table_no, group_code) };
+    });
+  };
+
+  // Both list tables, plus both thumbnail tables when the lists are empty
+  const extractAll = () => {
+    const $ = jq();
+    if (!$) return {};
+    const undrawn = [];
+    const engine_list = listView($, TABLE_IDS[0], undrawn);
+    const frame_list  = listView($, TABLE_IDS[1], undrawn);
+    const listEmpty = !(engine_list && engine_list.length) && !(frame_list && frame_list.length);
+    return {
+      engine_list,
+      frame_list,
+      engine_thumbs: listEmpty ? thumbnails($, TABLE_IDS[2], undrawn) : null,
+      frame_thumbs:  listEmpty ? thumbnails($, TABLE_IDS[3], undrawn) : null,
+      undrawn,
+    };
+  };
 
-# --- Get ALL rows from a client-side DataTable (thumbnails fallback) ---
-EXTRACT_THUMBNAILS_JS = """
-(sel) => {
-  const $ = window.jQuery || window.$;
-  if (!document.querySelector(sel) || !($ && $.fn && $.fn.DataTable)) return null;
-  const dt = $(sel).DataTable();
-
-  // IMPORTANT: request ALL rows regardless of current pagination
-  const nodes = dt.rows({ search: 'applied', page: 'all' }).nodes().toArray();
-
-  return nodes.map(tr => {
-    const link = tr.querySelector('.panel-heading a') || tr.querySelector('.panel-heading');
-    const text = (link?.innerText || '').trim();  // e.g., "E-1 (SHROUD / FAN COVER)" or "F-1 (FRAME BODY)"
-    const m = text.match(/^([^ \\t(]+)\\s*\\((.*)\\)\\s*$/);
-    const table_no = m ? m[1] : text;
-    const desc     = m ? m[2] : '';
-
-    const onclick = link?.getAttribute('onclick') || '';
-    const gm = onclick.match(/updateBomDetails\\(\\s*'([^']+)'/);
-    const group_code = gm ? gm[1] : '';
-
-    const vm = onclick.match(/updateBomDetails\\(\\s*'[^']*'\\s*,\\s*''\\s*,\\s*'([^']*)'\\s*\\)/);
-    const variant = vm ? vm[1] : null;
-
-    return { s_no: '', table_no, desc, group_code, variant };
-  });
-}
+  // Is group `gc` among the loaded aggregates rows? Drawn rows are checked by their
+  // markup (attributes included); undrawn ones by their DataTables cell data.
+  const hasGroup = (gc) => {
+    const $ = jq();
+    if (!$) return false;
+    return TABLE_IDS.some(sel => {
+      if (!document.querySelector(sel)) return false;
+      const rows = $(sel).DataTable().rows({ page: 'all' });
+      const data = rows.data().toArray();
+      return rows.nodes().toArray().some((tr, i) =>
+        tr ? tr.innerHTML.includes(gc) : JSON.stringify(data[i]).includes(gc));
+    });
+  };
+
+  window.__hero = { countsInfo, extractAll, hasGroup };
+})();
 """
 
+COUNTS_INFO_JS = "() => window.__hero.countsInfo()"
+# Rows come back as one pre-serialized JSON string: Playwright then ships a single string
+# value instead of wrapping every row/field in its own typed protocol envelope.
+EXTRACT_ALL_JS = "() => JSON.stringify(window.__hero.extractAll())"
+HAS_GROUP_JS = "(gc) => window.__hero.hasGroup(gc)"
 
-def _infer_group_type(table_no: str, group_code: str, fallback: str) -> str:
-    """ENGINE/FRAME decided per row, using the row's own tokens first."""
-    tn = (table_no or "").strip().upper()
-    gc = (group_code or "").strip().upper()
-    if tn.startswith("E-") or gc.startswith("E-"):
-        return "ENGINE"
-    if tn.startswith("F-") or gc.startswith("F-"):
-        return "FRAME"
-    return fallback  # only if neither token is present
+# Pooled page -> model code its aggregates panel currently shows
+_page_models: Dict[Page, str] = {}
 
 
-async def collect_indices(
-        page: Page,
-        vehicle: Vehicle,
-        prev_model_code: Optional[str] = None) -> List[TableIndex]:
+async def _load_model(page: Page, vehicle: Vehicle) -> str:
+    """Switch the page's SPA panel to ``vehicle``'s aggregates; returns the table selector found."""
     model = vehicle.model_code
-    logger.info(
-        f"Collecting aggregates for vehicle: {vehicle.vehicle_name} ({model})")
+    _page_models.pop(page, None)
 
     # Switch the SPA panel to this model
     await page.evaluate("(code) => window.loadModelAggregates('', code)",
@@ -160,32 +185,72 @@ async def collect_indices(
         )
 
     await wait_for_datatables(page, selector=found)
-
-    # Force DataTables to expose ALL rows (not just 25)
+    _page_models[page] = model
+    return found
+
+
+async def ensure_group_loaded(page: Page, vehicle: Vehicle,
+                              table_index: TableIndex) -> None:
+    """Make sure ``page`` shows ``vehicle``'s aggregates, with ``table_index``'s group in them.
+
+    Pooled pages keep whatever model they last loaded (another vehicle, or just the
+    catalogue), and updateBomDetails runs against that state. Reload the vehicle's
+    aggregates when the page shows another model, then require the group code to be
+    present, so a group can never be scraped out of another vehicle's aggregates.
+    """
+    if _page_models.get(page) != vehicle.model_code:
+        logger.debug("Loading aggregates for %s on a pooled page",
+                     vehicle.model_code)
+        await _load_model(page, vehicle)
     try:
-        await evaluate(page, PREPARE_SHOW_ALL_JS)
-        counts = await evaluate(page, COUNTS_INFO_JS)
-        logger.info(f"Aggregates DT info: {counts}")
-    except Exception:
-        pass
+        await page.wait_for_function(HAS_GROUP_JS,
+                                     arg=table_index.group_code,
+                                     timeout=MODEL_READY_TIMEOUT)
+    except PWTimeoutError:
+        _page_models.pop(page, None)
+        raise Exception(
+            f"Aggregates for {vehicle.vehicle_name} ({vehicle.model_code}) "
+            f"do not list group {table_index.group_code}")
+
+
+async def collect_indices(
+        page: Page,
+        vehicle: Vehicle,
+        prev_model_code: Optional[str] = None) -> List[TableIndex]:
+    model = vehicle.model_code
+    logger.info(
+        f"Collecting aggregates for vehicle: {vehicle.vehicle_name} ({model})")
+
+    await _load_model(page, vehicle)
+
+    # The extractor redraws each table with "show all" before reading its rows
+    if logger.isEnabledFor(logging.DEBUG):
+        try:
+            counts = await evaluate(page, COUNTS_INFO_JS)
+            logger.debug("Aggregates DT info: %s", counts)
+        except Exception:
+            pass
 
     aggregates_url = page.url
     all_indices: List[TableIndex] = []
 
-    # Always try both list tables, then both thumbnail tables as fallback
-    engine_rows = await evaluate(page, EXTRACT_LIST_VIEW_JS,
-                                 '#DataTables_Table_0') or []
-    frame_rows = await evaluate(page, EXTRACT_LIST_VIEW_JS,
-                                '#DataTables_Table_1') or []
+    # Both list tables, then both thumbnail tables as fallback (single round-trip)
+    data = orjson.loads(await evaluate(page, EXTRACT_ALL_JS) or "null") or {}
+    for mm in data.get('undrawn') or []:
+        logger.warning(
+            f"DataTables rows without a node on {mm.get('sel')} even after showing all: "
+            f"skipped {mm.get('missing')} of {mm.get('rows')} rows")
+    engine_rows = data.get('engine_list') or []
+    frame_rows = data.get('frame_list') or []
 
     if not engine_rows and not frame_rows:
         # thumbnails fallback
-        engine_rows = await evaluate(page, EXTRACT_THUMBNAILS_JS,
-                                     '#DataTables_Table_2') or []
-        frame_rows = await evaluate(page, EXTRACT_THUMBNAILS_JS,
-                                    '#DataTables_Table_3') or []
+        engine_rows = data.get('engine_thumbs') or []
+        frame_rows = data.get('frame_thumbs') or []
 
     # Build indices per row with robust group_type inference; do NOT drop on suffix mismatch
+    type_counts = {"ENGINE": 0, "FRAME": 0}
+
     def push(rows, table_hint):
         for it in rows or []:
             gc = it.get('group_code', '')
@@ -193,7 +258,8 @@ async def collect_indices(
             gd = it.get('desc', '')
             if not gc:
                 continue
-            gtype = _infer_group_type(tn, gc, fallback=table_hint)
+            gtype = it.get('group_type') or table_hint
+            type_counts[gtype] = type_counts.get(gtype, 0) + 1
             all_indices.append(
                 TableIndex(
                     vehicle_id=vehicle.vehicle_id,
@@ -212,8 +278,26 @@ async def collect_indices(
     logger.info(
         f"Collected {len(all_indices)} total groups for {vehicle.vehicle_name} (ENGINE/FRAME combined)"
     )
-    e_cnt = sum(1 for x in all_indices if x.group_type == "ENGINE")
-    f_cnt = sum(1 for x in all_indices if x.group_type == "FRAME")
-    logger.info(f"Groups breakdown: {e_cnt} ENGINE, {f_cnt} FRAME")
+    logger.info(
+        f"Groups breakdown: {type_counts['ENGINE']} ENGINE, {type_counts['FRAME']} FRAME"
+    )
 
     return all_indices
+
+
+async def collect_indices_batch(
+    pool: PagePool, vehicles: List[Vehicle]
+) -> List[Union[List[TableIndex], BaseException]]:
+    """Run collect_indices for several vehicles concurrently, one pooled page each.
+
+    Results are returned in the order of ``vehicles``; a vehicle that failed
+    yields its exception instead of a list so one bad model doesn't sink the batch.
+    """
+    sem = asyncio.Semaphore(config.MAX_CONCURRENT_GROUPS)
+
+    async def one(vehicle: Vehicle) -> List[TableIndex]:
+        async with sem, pool.acquire() as page:
+            return await collect_indices(page, vehicle)
+
+    return await asyncio.gather(*(one(v) for v in vehicles),
+                                return_exceptions=True)
@@ -1,18 +1,44 @@
 """Playwright browser automation helpers."""
 import asyncio
 import logging
-from typing import Any, List, Optional, Tuple
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page, TimeoutError as PlaywrightTimeoutError
+import re
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Sequence, Tuple
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Route, TimeoutError as PlaywrightTimeoutError
 
 from . import config
 
 logger = logging.getLogger(__name__)
 
+# Post-navigation readiness: what the DataTables extractors need, and how long to wait for it
+DATATABLES_READY_JS = "() => !!(window.jQuery && window.jQuery.fn.DataTable)"
+READY_TIMEOUT_MS = 5000
+
+# Returns the first selector present in the DOM (or null); used with wait_for_function
+ANY_SELECTOR_JS = "(sels) => sels.find(s => document.querySelector(s)) || null"
+
+# Images, fonts and media the scraper never needs (diagrams are downloaded separately).
+# Stylesheets still load: innerText and visibility waits depend on layout. Matched by URL
+# so documents, stylesheets, scripts and XHR never reach a Python handler.
+BLOCKED_URL_RE = re.compile(
+    r"\.(?:png|jpe?g|gif|webp|bmp|svg|ico|woff2?|ttf|otf|eot|mp4|webm|mp3)(?:[?#]|$)",
+    re.IGNORECASE)
+
+
+async def _abort(route: Route) -> None:
+    await route.abort()
+
 
 async def launch_browser(
-        headless: bool = True) -> Tuple[Browser, BrowserContext]:
+        headless: bool = True,
+        init_scripts: Sequence[str] = ()) -> Tuple[Browser, BrowserContext]:
     """Launch browser and create context.
-    
+
+    Args:
+        headless: Run Chromium without a window
+        init_scripts: JS sources installed on every page of the context
+            (parsed once per document instead of once per evaluate call)
+
     Returns:
         Tuple of (browser, context)
     """
@@ -35,6 +61,12 @@ async def launch_browser(
         'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
     )
 
+    if config.BLOCK_IMAGES:
+        await context.route(BLOCKED_URL_RE, _abort)
+
+    for script in init_scripts:
+        await context.add_init_script(script)
+
     return browser, context
 
 
@@ -43,16 +75,100 @@ async def new_page(context: BrowserContext) -> Page:
     return await context.new_page()
 
 
+class PagePool:
+    """Fixed-size pool of warm pages sharing one BrowserContext.
+
+    Pages are handed out one at a time via ``acquire()`` and returned as-is, so
+    whatever the ``warm`` hook loaded (e.g. the catalogue SPA with jQuery and
+    DataTables already parsed) stays loaded for the next caller.
+    """
+
+    def __init__(self,
+                 context: BrowserContext,
+                 size: int = config.MAX_CONCURRENT_GROUPS,
+                 warm: Optional[Callable[[Page], Awaitable[None]]] = None):
+        self.context = context
+        self.size = max(1, size)
+        self._warm = warm
+        self._pages: List[Page] = []
+        self._idle: "asyncio.Queue[Page]" = asyncio.Queue()
+
+    async def start(self, seed: Sequence[Page] = ()) -> "PagePool":
+        """Fill the pool; ``seed`` pages are adopted as-is (assumed already warm)."""
+        pages = list(seed)[:self.size]
+        pages += await asyncio.gather(*(self._new_warm_page()
+                                        for _ in range(self.size - len(pages))))
+        for page in pages:
+            self._pages.append(page)
+            self._idle.put_nowait(page)
+        logger.info(f"Page pool ready with {len(pages)} pages")
+        return self
+
+    async def _new_warm_page(self) -> Page:
+        page = await new_page(self.context)
+        if self._warm:
+            try:
+                await self._warm(page)
+            except BaseException:
+                await page.close()
+                raise
+        return page
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Page]:
+        """Borrow a page for the duration of the ``async with`` block."""
+        page = await self._idle.get()
+        if page.is_closed():
+            logger.warning("Pooled page was closed; replacing it")
+            try:
+                replacement = await self._new_warm_page()
+            except BaseException:
+                # Queue the dead page again so a later acquire retries the replacement
+                self._idle.put_nowait(page)
+                raise
+            if page in self._pages:
+                self._pages.remove(page)
+            self._pages.append(replacement)
+            page = replacement
+        try:
+            yield page
+        finally:
+            self._idle.put_nowait(page)
+
+    async def close(self) -> None:
+        for page in self._pages:
+            try:
+                await page.close()
+            except Exception:
+                pass
+        self._pages.clear()
+
+
 async def goto(page: Page,
                url: str,
-               wait_until: str = "domcontentloaded") -> None:
-    """Navigate to URL with error handling."""
+               wait_until: str = "domcontentloaded",
+               readiness_js: Optional[str] = None) -> None:
+    """Navigate to URL with error handling.
+
+    After navigation, waits until ``readiness_js`` returns truthy (or, if not
+    given, until the network is idle), capped at READY_TIMEOUT_MS. Hitting the
+    cap is not an error: callers still wait for the specific elements they need.
+    """
     try:
         logger.info(f"Navigating to: {url}")
         await page.goto(url,
                         wait_until=wait_until,
                         timeout=config.PAGE_LOAD_TIMEOUT)
-        await asyncio.sleep(1)  # Brief pause for any dynamic content
+        try:
+            if readiness_js:
+                await page.wait_for_function(readiness_js,
+                                             timeout=READY_TIMEOUT_MS)
+            else:
+                await page.wait_for_load_state("networkidle",
+                                               timeout=READY_TIMEOUT_MS)
+        except PlaywrightTimeoutError:
+            logger.debug("Page not ready after %dms, continuing: %s",
+                         READY_TIMEOUT_MS, url)
     except PlaywrightTimeoutError:
         logger.error(f"Timeout loading page: {url}")
         raise
@@ -96,7 +212,7 @@ async def evaluate(page: Page, js: str, *args) -> Any:
         return result
     except Exception as e:
         logger.error(f"JavaScript evaluation failed: {e}")
-        logger.debug(f"JS code: {js}")
+        logger.debug("JS code: %s", js)
         raise
 
 
@@ -109,28 +225,17 @@ async def wait_for_selector_any(page: Page,
         The first selector that appears, or None if timeout
     """
     try:
-        tasks = []
-        for selector in selectors:
-            task = asyncio.create_task(
-                page.wait_for_selector(selector, timeout=timeout_ms))
-            tasks.append((selector, task))
-
-        done, pending = await asyncio.wait([task for _, task in tasks],
-                                           return_when=asyncio.FIRST_COMPLETED,
-                                           timeout=timeout_ms / 1000)
-
-        # Cancel pending tasks
-        for task in pending:
-            task.cancel()
-
-        # Find which selector completed first
-        if done:
-            completed_task = next(iter(done))
-            for selector, task in tasks:
-                if task == completed_task:
-                    logger.debug(f"Found selector: {selector}")
-                    return selector
+        # One in-page poll instead of one wait_for_selector subscription per selector
+        handle = await page.wait_for_function(
+            ANY_SELECTOR_JS,
+            arg=selectors,
+            timeout=timeout_ms,
+        )
+        selector = await handle.json_value()
+        logger.debug("Found selector: %s", selector)
+        return selector
 
+    except PlaywrightTimeoutError:
         logger.warning(f"None of the selectors found: {selectors}")
         return None
 
@@ -145,7 +250,7 @@ async def wait_for_selector(page: Page,
     """Wait for a single selector with error handling."""
     try:
         await page.wait_for_selector(selector, timeout=timeout_ms)
-        logger.debug(f"Found selector: {selector}")
+        logger.debug("Found selector: %s", selector)
         return True
     except PlaywrightTimeoutError:
         logger.warning(f"Timeout waiting for selector: {selector}")
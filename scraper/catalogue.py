@@ -5,11 +5,11 @@ from playwright.async_api import Page
 
 from .datamodel import Vehicle
 from .utils import slugify_name, parse_datatable_info
-from .browser import goto, wait_for_selector, wait_for_datatables, evaluate
+from .browser import goto, wait_for_selector, wait_for_datatables, evaluate, DATATABLES_READY_JS
 
 logger = logging.getLogger(__name__)
 
-# JavaScript to extract vehicles from current page
+# JavaScript to extract vehicles from the current page (fallback when DataTables is absent)
 EXTRACT_CURRENT_PAGE_JS = """
 (() => {
   const parseModel = (el) => {
@@ -30,39 +30,63 @@ EXTRACT_CURRENT_PAGE_JS = """
 })()
 """
 
-# JavaScript to get DataTables pagination info and navigate
-GET_PAGINATION_INFO_JS = """
+# JavaScript to extract vehicles from every DataTables page at once (no pagination clicks)
+EXTRACT_ALL_PAGES_JS = """
 (() => {
   const $ = window.jQuery || window.$;
   if (!$ || !$.fn || !$.fn.dataTable) return null;
-  
+
   const table = $('#datatable-t2');
   if (!table.length) return null;
-  
+
+  const parseModel = (el) => {
+    const oc = (el?.getAttribute('onclick') || '');
+    const m = oc.match(/loadModelAggregates\\(\\s*''\\s*,\\s*'([^']+)'\\s*\\)/);
+    return m ? m[1] : '';
+  };
+
+  // "Show all" first so every row is drawn and attached: innerText on a detached
+  // (off-page) row falls back to textContent and would change the vehicle names.
+  // Each row holds several vehicle panels (3 columns per row).
   const dt = table.DataTable();
-  const info = dt.page.info();
-  
+  if (dt.page.len() !== -1) dt.page.len(-1).draw(false);
+  const nodes = dt.rows({ page: 'all' }).nodes().toArray();
+  // deferRender tables have no node for rows never drawn: report them, don't drop them
+  const undrawn = nodes.filter(tr => !tr).length;
+  if (undrawn) return { totalRecords: dt.page.info().recordsTotal, undrawn, vehicles: [] };
+
+  const headings = nodes.flatMap(tr => Array.from(
+    tr.querySelectorAll('.panel .panel-heading[onclick*="loadModelAggregates"]')));
+
   return {
-    currentPage: info.page,
-    totalPages: info.pages,
-    totalRecords: info.recordsTotal,
-    recordsDisplay: info.recordsDisplay,
-    start: info.start,
-    end: info.end,
-    length: info.length
+    totalRecords: dt.page.info().recordsTotal,
+    undrawn: 0,
+    vehicles: headings.map(h => ({
+      name: (h.innerText || '').trim(),
+      modelCode: parseModel(h)
+    })).filter(x => x.name && x.modelCode)
   };
 })()
 """
 
+# JavaScript to get DataTables pagination info
+GET_PAGINATION_INFO_JS = """
+(() => {
+  const $ = window.jQuery || window.$;
+  const info = $('#datatable-t2').DataTable().page.info();
+  return { totalPages: info.pages, totalRecords: info.recordsTotal };
+})()
+"""
+
 # JavaScript to navigate to specific page and wait for update
 NAVIGATE_TO_PAGE_JS = """
 async (pageNum) => {
   const $ = window.jQuery || window.$;
   const dt = $('#datatable-t2').DataTable();
-  
+
   // Navigate to page
   dt.page(pageNum);
-  
+
   // Force redraw and wait for it to complete
   return new Promise((resolve) => {
     dt.one('draw.dt', () => {
@@ -75,53 +99,63 @@ async (pageNum) => {
 """
 
 
+async def _collect_page_by_page(page: Page) -> List[dict]:
+    """Draw each DataTables page in turn and extract the vehicles it renders.
+
+    Slow path for tables that only create row nodes when drawn (deferRender).
+    """
+    pagination_info = await evaluate(page, GET_PAGINATION_INFO_JS)
+    total_pages = pagination_info['totalPages']
+    vehicles_data = []
+
+    for page_num in range(total_pages):
+        logger.info(f"Processing page {page_num + 1}/{total_pages}")
+
+        # Navigate to specific page
+        try:
+            await evaluate(page, NAVIGATE_TO_PAGE_JS, page_num)
+        except Exception as e:
+            logger.error(f"Failed to navigate to page {page_num}: {e}")
+            continue
+
+        # Extract vehicles from current page
+        try:
+            page_vehicles = await evaluate(page, EXTRACT_CURRENT_PAGE_JS)
+            logger.info(
+                f"Found {len(page_vehicles)} vehicles on page {page_num + 1}")
+            vehicles_data.extend(page_vehicles)
+        except Exception as e:
+            logger.error(
+                f"Failed to extract vehicles from page {page_num}: {e}")
+            continue
+
+    return vehicles_data
+
+
 async def collect_vehicles(page: Page, catalog_url: str) -> List[Vehicle]:
     """Collect all vehicles from the main catalog page across ALL DataTables pages."""
     logger.info(f"Collecting vehicles from catalog: {catalog_url}")
 
     # Navigate to catalog and wait for table
-    await goto(page, catalog_url)
+    await goto(page, catalog_url, readiness_js=DATATABLES_READY_JS)
     if not await wait_for_selector(page, '#datatable-t2'):
         raise Exception("Main catalog table #datatable-t2 not found")
 
     await wait_for_datatables(page)
 
-    vehicles_data = []
-
-    # Check if DataTables is available and get pagination info
-    pagination_info = await evaluate(page, GET_PAGINATION_INFO_JS)
+    # Extract every page in one call via the DataTables API
+    all_pages = await evaluate(page, EXTRACT_ALL_PAGES_JS)
 
-    if pagination_info:
-        total_pages = pagination_info['totalPages']
+    if all_pages and all_pages.get('undrawn'):
         logger.info(
-            f"DataTables detected with {total_pages} pages (total records: {pagination_info['totalRecords']})"
+            f"DataTables has {all_pages['undrawn']} undrawn rows (deferRender); extracting page by page"
+        )
+        vehicles_data = await _collect_page_by_page(page)
+    elif all_pages:
+        vehicles_data = all_pages.get('vehicles') or []
+        logger.info(
+            f"DataTables detected: extracted {len(vehicles_data)} vehicles from all pages (total records: {all_pages.get('totalRecords')})"
         )
-
-        for page_num in range(total_pages):
-            logger.info(f"Processing page {page_num + 1}/{total_pages}")
-
-            # Navigate to specific page
-            if page_num > 0:  # Skip navigation for first page (already there)
-                try:
-                    await evaluate(page, NAVIGATE_TO_PAGE_JS, page_num)
-                    # Additional wait to ensure page is fully loaded
-                    await page.wait_for_timeout(200)
-                except Exception as e:
-                    logger.error(f"Failed to navigate to page {page_num}: {e}")
-                    continue
-
-            # Extract vehicles from current page
-            try:
-                page_vehicles = await evaluate(page, EXTRACT_CURRENT_PAGE_JS)
-                logger.info(
-                    f"Found {len(page_vehicles)} vehicles on page {page_num + 1}"
-                )
-                vehicles_data.extend(page_vehicles)
-            except Exception as e:
-                logger.error(
-                    f"Failed to extract vehicles from page {page_num}: {e}")
-                continue
-
     else:
         logger.warning(
             "DataTables not detected; falling back to single page extraction")
@@ -130,29 +164,23 @@ async def collect_vehicles(page: Page, catalog_url: str) -> List[Vehicle]:
     if not vehicles_data:
         raise Exception("No vehicles found in catalog")
 
-    # Convert to Vehicle objects and deduplicate
-    seen_models = set()
-    vehicles: List[Vehicle] = []
-
+    # Deduplicate on model_code (first occurrence wins), then convert to Vehicle objects
+    unique = {}
     for item in vehicles_data:
-        name = (item.get('name') or '').strip()
         model_code = (item.get('modelCode') or '').strip()
-
-        if not name or not model_code:
-            logger.debug(f"Skipping invalid vehicle data: {item}")
-            continue
-
-        if model_code in seen_models:
-            logger.debug(f"Skipping duplicate model_code: {model_code}")
-            continue
-
-        seen_models.add(model_code)
-
-        vehicles.append(
-            Vehicle(vehicle_id=slugify_name(name),
-                    vehicle_name=name,
-                    model_code=model_code,
-                    source_url=catalog_url))
+        name = (item.get('name') or '').strip()
+        if model_code and name and model_code not in unique:
+            unique[model_code] = name
+
+    vehicles: List[Vehicle] = [
+        Vehicle(vehicle_id=slugify_name(name),
+                vehicle_name=name,
+                model_code=model_code,
+                source_url=catalog_url)
+        for model_code, name in unique.items()
+    ]
+    logger.debug("Skipped %d invalid/duplicate vehicle entries",
+                 len(vehicles_data) - len(vehicles))
 
     # Verify count against DataTables info
     try:
@@ -169,7 +197,7 @@ async def collect_vehicles(page: Page, catalog_url: str) -> List[Vehicle]:
             logger.info(
                 f"Vehicle count verified: {len(vehicles)}/{expected_count}")
     except Exception as e:
-        logger.debug(f"Could not verify vehicle count: {e}")
+        logger.debug("Could not verify vehicle count: %s", e)
 
     logger.info(f"Collected {len(vehicles)} unique vehicles")
 
@@ -1,5 +1,6 @@
 """Configuration settings for Hero scraper."""
 import os
+from functools import lru_cache
 from pathlib import Path
 
 # Base settings
@@ -13,20 +14,42 @@ PROJECT_ROOT = Path(__file__).parent.parent
 OUTPUT_DIR = PROJECT_ROOT / "data"
 CSV_OUTPUT = OUTPUT_DIR / "csv" / "parts_master.csv"
 PARQUET_OUTPUT = OUTPUT_DIR / "parquet" / "parts_master.parquet"
+PARQUET_DATASET_DIR = OUTPUT_DIR / "parquet" / "parts"  # one file per scraped group
 SQLITE_PATH = OUTPUT_DIR / "sqlite" / "hero_catalogue.sqlite"
 IMAGES_DIR = OUTPUT_DIR / "images"
 
+# Parquet export settings
+PARQUET_ROW_GROUP_ROWS = 400_000  # ~128 MB of parts rows per row group / write batch
+
+# SQLite settings
+WAL_CHECKPOINT_INTERVAL_S = 30  # background WAL checkpoint period (auto-checkpoint is off)
+
 # Browser settings
 BROWSER_TIMEOUT = 30000  # milliseconds
 PAGE_LOAD_TIMEOUT = 30000
+BLOCK_IMAGES = True  # abort image/font/media requests (diagrams are fetched via HTTP session)
 
 # HTTP settings
 REQUEST_TIMEOUT = 30
 MAX_RETRIES = 3
 RETRY_DELAY = 2
+IMAGE_REVALIDATE = False  # on resume, HEAD already-downloaded images and refetch if ETag/size changed
+
+
+def set_output_dir(path) -> None:
+    """Point OUTPUT_DIR (and every path derived from it) at ``path``."""
+    global OUTPUT_DIR, CSV_OUTPUT, PARQUET_OUTPUT, PARQUET_DATASET_DIR, SQLITE_PATH, IMAGES_DIR
+    OUTPUT_DIR = Path(path)
+    CSV_OUTPUT = OUTPUT_DIR / "csv" / "parts_master.csv"
+    PARQUET_OUTPUT = OUTPUT_DIR / "parquet" / "parts_master.parquet"
+    PARQUET_DATASET_DIR = OUTPUT_DIR / "parquet" / "parts"
+    SQLITE_PATH = OUTPUT_DIR / "sqlite" / "hero_catalogue.sqlite"
+    IMAGES_DIR = OUTPUT_DIR / "images"
+    ensure_directories.cache_clear()
 
 
-# Ensure directories exist
+# Ensure directories exist (once per OUTPUT_DIR; set_output_dir() resets the cache)
+@lru_cache(maxsize=None)
 def ensure_directories():
     """Create necessary directories if they don't exist."""
     dirs_to_create = [
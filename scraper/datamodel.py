@@ -15,6 +15,9 @@ class Vehicle:
 @dataclass
 class TableIndex:
     """Represents an Engine/Frame row on the aggregates page."""
+    __slots__ = ("vehicle_id", "group_type", "s_no", "table_no", "group_desc",
+                 "group_code", "variant", "aggregates_url")
+
     vehicle_id: str
     group_type: Literal["ENGINE", "FRAME"]
     s_no: str
@@ -39,6 +42,11 @@ class PartsPage:
 @dataclass
 class PartRow:
     """Represents a single parts row."""
+    # Created once per scraped row: slots (no per-instance __dict__) keep that cheap.
+    # Declared by hand rather than dataclass(slots=True) to stay Python 3.8-compatible.
+    __slots__ = ("vehicle_id", "group_type", "table_no", "group_code", "ref_no",
+                 "part_no", "description", "remark", "req_no", "moq", "mrp")
+
     vehicle_id: str
     group_type: Literal["ENGINE", "FRAME"]
     table_no: str
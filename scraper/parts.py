@@ -2,16 +2,20 @@
 """Parts scraper - extracts individual parts and diagram images (popup-aware)."""
 import asyncio
 import logging
-from pathlib import Path
-from typing import List, Tuple, Optional
+import os
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Tuple, Optional
 
+import orjson
 import requests
 from playwright.async_api import Page, TimeoutError as PWTimeoutError
 
 from . import config
 from .datamodel import Vehicle, TableIndex, PartsPage, PartRow, PARTS_HEADER_MAPPING
-from .utils import clean_text, parse_datatable_info
-from .session import download_image
+from .utils import parse_datatable_info
+from .session import download_image_async
+from .browser import ANY_SELECTOR_JS
 
 logger = logging.getLogger(__name__)
 
@@ -20,48 +24,207 @@ logger = logging.getLogger(__name__)
 PARTS_SELECTORS = [
     "#bomPage", "#bomPage_wrapper", "#bomPage_info", "#image img"
 ]
+PARTS_WAIT_MS = 45_000
+PARTS_READY_MS = 5_000  # cap on waiting for #bomPage's DataTable to initialise
+
+# image_path is stored relative to this; resolved once, not per download
+_PROJECT_ROOT = str(Path(getattr(config, "PROJECT_ROOT", ".")).resolve())
+
+
+@lru_cache(maxsize=None)
+def _images_prefix(images_dir: str) -> PurePosixPath:
+    """IMAGES_DIR relative to the project root (e.g. data/images), as stored in image_path."""
+    try:
+        rel = os.path.relpath(os.path.abspath(images_dir), _PROJECT_ROOT)
+    except ValueError:  # different drive on Windows
+        rel = images_dir
+    return PurePosixPath(Path(rel).as_posix())
+
+# PartRow fields filled from the parts table columns
+PART_FIELDS = ("ref_no", "part_no", "description", "remark", "req_no", "moq",
+               "mrp")
 
 
 async def _wait_for_any(page_like, selectors,
                         timeout_ms: int) -> Optional[str]:
-    """Wait for any selector on a Page or Frame; return the one that appears, else None."""
-    deadline = asyncio.get_event_loop().time() + (timeout_ms / 1000.0)
-    while asyncio.get_event_loop().time() < deadline:
-        for sel in selectors:
-            try:
-                el = await page_like.query_selector(sel)
-                if el:
-                    return sel
-            except Exception:
-                pass
-        await asyncio.sleep(0.15)
-    return None
+    """Wait for any selector on a Page or Frame; return the one that appears, else None.
+
+    The check runs in-page (one wait_for_function), not as a Python-side polling loop.
+    """
+    try:
+        handle = await page_like.wait_for_function(ANY_SELECTOR_JS,
+                                                   arg=selectors,
+                                                   timeout=timeout_ms)
+        return await handle.json_value()
+    except Exception:
+        return None
 
 
 async def _extract_parts_table(page_like):
-    """Run inside the parts host (popup page or same page) to pull DataTables rows."""
-    return await page_like.evaluate("""
-        () => {
-          const $ = window.jQuery || window.$;
-          const headers = Array.from(document.querySelectorAll('#bomPage thead th'))
-            .map(th => th.innerText.trim());
-          const dt = $('#bomPage').DataTable();
-          const nodes = dt.rows().nodes().toArray();
-          const rows = nodes.map(tr => Array.from(tr.querySelectorAll('td')).map(td => td.innerText.trim()));
-          const info = document.querySelector('#bomPage_info')?.innerText || '';
-          return { headers, rows, info };
-        }
-        """)
+    """Run inside the parts host (popup page or same page) to pull DataTables rows.
+
+    Headers are mapped to PartRow field names in the page, so each row comes
+    back as {ref_no, part_no, ...} holding only the columns we keep.
+    """
+    return orjson.loads(await page_like.evaluate(EXTRACT_PARTS_JS))
 
 
 async def _get_image_src(page_like) -> Optional[str]:
     try:
-        return await page_like.evaluate(
-            "() => document.querySelector('#image img')?.src || null")
+        return await page_like.evaluate(GET_IMAGE_SRC_JS)
     except Exception:
         return None
 
 
+# ---------- Page-side helpers ----------
+
+# Installed once per document on every page of the context (see pipeline), so each
+# evaluate() below only ships a one-line call instead of re-sending the source.
+#
+# window.open calls without an explicit target go to one named window per opener
+# document, so the next updateBomDetails navigates the existing parts window instead
+# of spawning (and later closing) a new popup.
+PARTS_JS_BUNDLE = """
+(() => {
+  const open = window.open.bind(window);
+  const name = '__hero_parts_' + Math.random().toString(36).slice(2);
+  window.open = (url, target, features) =>
+    open(url, (!target || target === '_blank') ? name : target, features);
+
+  const HEADER_MAP = %(header_map)s;
+  const FIELDS = %(fields)s;
+
+  const hasTable = () => !!document.querySelector('#bomPage, #bomPage_wrapper');
+
+  // No #bomPage to wait for (e.g. image-only page), or DataTables has initialised it
+  const ready = () => {
+    if (!document.querySelector('#bomPage')) return true;
+    const $ = window.jQuery || window.$;
+    return !!($ && $.fn && $.fn.dataTable && $.fn.dataTable.isDataTable('#bomPage'));
+  };
+
+  // Right vehicle/group? (url, header and table checks in one call)
+  const verify = (gc, titleFrag) => {
+    const url_ok = location.href.includes(gc);
+    const hdr =
+      document.querySelector('.panel-title, .modal-title, .panel-heading')?.innerText || '';
+    const table_ok = hasTable();
+    // More lenient: check if any part of group code is present, or if table exists
+    const hdr_ok = hdr.includes(gc) || hdr.includes(titleFrag) || table_ok;
+    return { url_ok, hdr_ok, table_ok };
+  };
+
+  const extractParts = () => {
+    const $ = window.jQuery || window.$;
+    const keys = Array.from(document.querySelectorAll('#bomPage thead th'))
+      .map(th => {
+        const h = th.innerText.trim();
+        return HEADER_MAP[h] || h.toLowerCase().replace(/ /g, '_');
+      });
+    const slots = FIELDS.map(f => keys.indexOf(f));
+    const dt = $('#bomPage').DataTable();
+    const nodes = dt.rows().nodes().toArray();
+    const rows = nodes.map(tr => {
+      const tds = tr.querySelectorAll('td');
+      const row = {};
+      FIELDS.forEach((f, i) => { row[f] = (tds[slots[i]]?.innerText || '').trim(); });
+      return row;
+    });
+    const info = document.querySelector('#bomPage_info')?.innerText || '';
+    // page.info() is undefined when #bomPage isn't a DataTable: no expected count then
+    const pageInfo = dt.page && dt.page.info();
+    return { rows, info, expected_count: pageInfo ? pageInfo.recordsTotal : null };
+  };
+
+  const getImageSrc = () => document.querySelector('#image img')?.src || null;
+
+  window.__scrape = { ready, verify, extractParts, getImageSrc };
+})();
+""" % {
+    "header_map": orjson.dumps(PARTS_HEADER_MAPPING).decode(),
+    "fields": orjson.dumps(PART_FIELDS).decode()
+}
+
+PARTS_READY_JS = "() => window.__scrape.ready()"
+VERIFY_JS = "(args) => window.__scrape.verify(args.gc, args.titleFrag)"
+# Pre-serialized in the page: one string crosses the wire and orjson parses it
+EXTRACT_PARTS_JS = "() => JSON.stringify(window.__scrape.extractParts())"
+GET_IMAGE_SRC_JS = "() => window.__scrape.getImageSrc()"
+
+# Opener page -> its parts window, kept open between groups
+_parts_windows: Dict[Page, Page] = {}
+
+
+async def _open_parts_window(page: Page,
+                             group_code: str,
+                             variant: str,
+                             timeout_ms: int = PARTS_WAIT_MS) -> Page:
+    """Fire updateBomDetails on ``page`` and return the window showing the parts UI.
+
+    Resolves on whichever comes first: a new popup, or the reused parts window
+    navigating, then waits for DOMContentLoaded (not the full load event: the
+    parts UI needs the DOM and scripts, not trailing assets). Raises
+    PWTimeoutError if no window shows up. Used for both the first attempt and
+    the mismatch retry in collect_parts.
+    """
+    reuse = _parts_windows.get(page)
+    if reuse is not None and reuse.is_closed():
+        reuse = None
+
+    waiters = [asyncio.ensure_future(page.wait_for_event("popup"))]
+    if reuse is not None:
+        waiters.append(
+            asyncio.ensure_future(
+                reuse.wait_for_event(
+                    "framenavigated",
+                    predicate=lambda fr: fr == reuse.main_frame)))
+    try:
+        await page.evaluate(
+            "(arg) => window.updateBomDetails(arg.code, '', arg.variant || '')",
+            {
+                "code": group_code,
+                "variant": variant
+            },
+        )
+        done, _ = await asyncio.wait(waiters,
+                                     return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for w in waiters:
+            if not w.done():
+                w.cancel()
+
+    first = done.pop()
+    result = first.result()  # re-raises PWTimeoutError
+    if first is waiters[0]:
+        # New popup (first group on this page, or the site bypassed window.open)
+        if reuse is not None:
+            await _discard_parts_window(page, reuse)
+        _parts_windows[page] = result
+        window = result
+    else:
+        window = reuse
+
+    try:
+        await window.wait_for_load_state("domcontentloaded",
+                                         timeout=timeout_ms)
+    except PWTimeoutError:
+        logger.debug("Parts window for %s not DOM-ready after %dms",
+                     group_code, timeout_ms)
+    return window
+
+
+async def _discard_parts_window(page: Page, popup: Optional[Page]) -> None:
+    """Close ``popup`` and stop reusing it for ``page``."""
+    if popup is None:
+        return
+    if _parts_windows.get(page) is popup:
+        del _parts_windows[page]
+    try:
+        await popup.close()
+    except Exception:
+        pass
+
+
 # ---------- Main entry ----------
 
 
@@ -80,24 +243,18 @@ async def collect_parts(
         f"Collecting parts for {nice_name} - {table_index.group_type} {table_index.table_no}"
     )
 
-    context = page.context
     popup = None
     parts_host = page  # will switch to popup or iframe when detected
-    parts_wait_ms = 45_000
+    parts_wait_ms = PARTS_WAIT_MS
 
-    # 1) Fire updateBomDetails and capture popup if it opens (NOTE: single arg object!)
+    # 1) Fire updateBomDetails and capture the parts window (new popup or reused one)
+    #    Popups are tracked per opener page so concurrent groups on sibling pages
+    #    each get their own.
     try:
-        async with context.expect_page() as popup_info:
-            await page.evaluate(
-                "(arg) => window.updateBomDetails(arg.code, '', arg.variant || '')",
-                {
-                    "code": group_code,
-                    "variant": variant
-                },
-            )
-        popup = await popup_info.value
+        popup = await _open_parts_window(page, group_code, variant,
+                                         parts_wait_ms)
         parts_host = popup
-        logger.debug(f"Popup captured for group {group_code}: {popup.url}")
+        logger.debug("Parts window for group %s: %s", group_code, popup.url)
     except PWTimeoutError:
         popup = None
         parts_host = page
@@ -124,43 +281,32 @@ async def collect_parts(
         except Exception:
             current = page.url
         logger.error("Parts UI not found for %s. URL=%s", group_code, current)
-        try:
-            if popup:
-                await popup.close()
-        except Exception:
-            pass
+        await _discard_parts_window(page, popup)
         raise Exception(
             f"Parts UI not found for {group_code} (waited {parts_wait_ms//1000}s)"
         )
 
+    # Proceed as soon as the parts DataTable is initialised (no fixed delay). Pages
+    # without #bomPage are ready at once; hitting the cap is not a mismatch.
+    try:
+        await parts_host.wait_for_function(PARTS_READY_JS,
+                                           timeout=PARTS_READY_MS)
+    except PWTimeoutError:
+        logger.debug("Parts DataTable for %s not initialised after %dms, continuing",
+                     group_code, PARTS_READY_MS)
+
     # ==== Verification it's the right vehicle/group (with retry logic) ====
     try:
-        # Wait a bit for page to fully load
-        await parts_host.wait_for_timeout(500)
-        
+        # One round-trip for all three checks:
         # 1) URL should include the group code
-        url_ok = await (parts_host if parts_host != page else
-                        (popup or page)).evaluate(
-                            "(gc) => location.href.includes(gc)", group_code)
         # 2) The header usually contains group code or vehicle name (more lenient check)
-        hdr_ok = await parts_host.evaluate(
-            """
-            (gc, titleFrag) => {
-              const hdr =
-                document.querySelector('.panel-title, .modal-title, .panel-heading')?.innerText || '';
-              // More lenient: check if any part of group code is present, or if table exists
-              return hdr.includes(gc) || hdr.includes(titleFrag) || 
-                     !!document.querySelector('#bomPage') || !!document.querySelector('#bomPage_wrapper');
-            }
-            """,
-            group_code,
-            nice_name[:20],
-        )
         # 3) Table exists
-        table_ok = await parts_host.evaluate(
-            "() => !!document.querySelector('#bomPage') || !!document.querySelector('#bomPage_wrapper')"
-        )
-        
+        checks = await parts_host.evaluate(VERIFY_JS, {
+            "gc": group_code,
+            "titleFrag": nice_name[:20]
+        })
+        url_ok, table_ok = checks["url_ok"], checks["table_ok"]
+
         # More lenient validation - only retry if both URL and table are missing
         if not (url_ok or table_ok):
             raise RuntimeError("mismatch")
@@ -168,22 +314,11 @@ async def collect_parts(
         logger.warning(
             f"Parts popup mismatch (likely previous vehicle). Retrying {group_code} after short delay…"
         )
-        try:
-            if popup:
-                await popup.close()
-        except Exception:
-            pass
+        await _discard_parts_window(page, popup)
 
         await page.wait_for_timeout(1000)  # let SPA catch up
-        async with context.expect_page() as popup_info:
-            await page.evaluate(
-                "(arg) => window.updateBomDetails(arg.code, '', arg.variant || '')",
-                {
-                    "code": group_code,
-                    "variant": variant
-                },
-            )
-        popup = await popup_info.value
+        popup = await _open_parts_window(page, group_code, variant,
+                                         parts_wait_ms)
         parts_host = popup
         await _wait_for_any(parts_host, PARTS_SELECTORS, parts_wait_ms)
 
@@ -195,14 +330,13 @@ async def collect_parts(
 
     # 3) Extract parts table
     data = await _extract_parts_table(parts_host)
-    headers = data.get("headers", [])
     rows = data.get("rows", [])
     info_text = data.get("info", "")
     logger.info(f"Found {len(rows)} parts rows for {group_code}")
 
     # Validate expected count if available
     try:
-        expected = parse_datatable_info(info_text)
+        expected = data.get("expected_count") or parse_datatable_info(info_text)
         if expected and len(rows) < expected:
             logger.warning(
                 f"Parts count mismatch for {group_code}: found {len(rows)}, expected {expected}"
@@ -210,30 +344,14 @@ async def collect_parts(
     except Exception:
         pass
 
-    # Map rows -> PartRow
-    part_rows: List[PartRow] = []
-    header_map = [h.strip() for h in headers]
-    for r in rows:
-        if len(r) < len(header_map):
-            r = r + [""] * (len(header_map) - len(r))
-        mapped = {}
-        for i, hdr in enumerate(header_map):
-            key = PARTS_HEADER_MAPPING.get(hdr, hdr.lower().replace(" ", "_"))
-            mapped[key] = clean_text(r[i])
-        part_rows.append(
-            PartRow(
+    # Rows arrive keyed by PartRow field (mapped and trimmed in the page)
+    part_rows: List[PartRow] = [
+        PartRow(**r,
                 vehicle_id=vehicle.vehicle_id,
                 group_type=table_index.group_type,
                 table_no=table_index.table_no,
-                group_code=table_index.group_code,
-                ref_no=mapped.get("ref_no", ""),
-                part_no=mapped.get("part_no", ""),
-                description=mapped.get("description", ""),
-                remark=mapped.get("remark", ""),
-                req_no=mapped.get("req_no", ""),
-                moq=mapped.get("moq", ""),
-                mrp=mapped.get("mrp", ""),
-            ))
+                group_code=table_index.group_code) for r in rows
+    ]
 
     # 4) Download diagram image
     image_path_str: Optional[str] = None
@@ -244,15 +362,18 @@ async def collect_parts(
             target_dir = config.IMAGES_DIR / vehicle.vehicle_id / table_index.group_type
             target_dir.mkdir(parents=True, exist_ok=True)
             target_path_no_ext = target_dir / f"{table_index.table_no}"
-            downloaded = download_image(session, img_src, target_path_no_ext)
+            downloaded = await download_image_async(
+                session,
+                img_src,
+                target_path_no_ext,
+                referer=getattr(parts_host, "url", None) or page.url)
             if downloaded:
                 image_saved = True
-                try:
-                    abs_dl = Path(downloaded).resolve()
-                    root = Path(getattr(config, "PROJECT_ROOT", ".")).resolve()
-                    image_path_str = str(abs_dl.relative_to(root))
-                except Exception:
-                    image_path_str = str(Path(downloaded))
+                # Built from what we already know: no filesystem calls per image
+                image_path_str = str(
+                    _images_prefix(str(config.IMAGES_DIR)) /
+                    vehicle.vehicle_id / table_index.group_type /
+                    os.path.basename(downloaded))
                 logger.info(f"Downloaded diagram: {image_path_str}")
             else:
                 logger.warning(f"Failed to download image: {img_src}")
@@ -277,12 +398,7 @@ async def collect_parts(
         image_path=image_path_str,
     )
 
-    # 6) Close popup if one was opened
-    try:
-        if popup:
-            await popup.close()
-    except Exception:
-        pass
+    # 6) The parts window stays open: the next group on this page navigates it
 
     logger.info(f"Collected {len(part_rows)} parts for {group_code}")
     return parts_page, part_rows, image_saved
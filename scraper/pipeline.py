@@ -1,10 +1,11 @@
 """Main pipeline orchestrator."""
+import asyncio
 import logging
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
 
 from . import config
-from .browser import launch_browser, new_page
-from .session import make_session
+from .browser import PagePool, launch_browser, new_page, goto, wait_for_datatables, DATATABLES_READY_JS
+from .session import make_session, close_thread_sessions
 from .store import DataStore
 from . import catalogue as catalog, aggregates, parts
 from .datamodel import Vehicle, TableIndex
@@ -17,9 +18,11 @@ class ScrapingPipeline:
 
     def __init__(self,
                  force_reprocess: bool = False,
-                 save_parquet: bool = False):
+                 save_parquet: bool = True,
+                 write_csv: bool = False):
         self.force_reprocess = force_reprocess
         self.save_parquet = save_parquet
+        self.write_csv = write_csv
         self.store = DataStore()
 
         # run stats
@@ -38,6 +41,7 @@ class ScrapingPipeline:
 
     async def run(self, catalog_url: str):
         """Run the complete scraping pipeline."""
+        # Before make_session(): the session's default Referer comes from BASE_URL
         config.BASE_URL = catalog_url
         config.ensure_directories()
 
@@ -45,9 +49,15 @@ class ScrapingPipeline:
         logger.info(f"Catalog URL: {catalog_url}")
         logger.info(f"Force reprocess: {self.force_reprocess}")
         logger.info(f"Save Parquet: {self.save_parquet}")
+        logger.info(f"Write CSV: {self.write_csv}")
 
+        # Template for the per-thread download sessions (those are warmed up as created)
         session = make_session()
-        browser, context = await launch_browser(headless=config.HEADLESS)
+        browser, context = await launch_browser(
+            headless=config.HEADLESS,
+            init_scripts=[
+                aggregates.HERO_JS_BUNDLE, parts.PARTS_JS_BUNDLE
+            ])
 
         try:
             page = await new_page(context)
@@ -55,8 +65,17 @@ class ScrapingPipeline:
             # Step 1: Collect vehicles
             vehicles = await self._collect_vehicles(page, catalog_url)
 
+            # Keep the catalogue page and warm up the rest of the pool on the same SPA
+            async def open_catalog(p):
+                await goto(p, catalog_url, readiness_js=DATATABLES_READY_JS)
+                await wait_for_datatables(p)
+
+            pool = await PagePool(context,
+                                  size=config.MAX_CONCURRENT_GROUPS,
+                                  warm=open_catalog).start(seed=[page])
+
             # Step 2: Process each vehicle
-            await self._process_vehicles(page, vehicles, session)
+            await self._process_vehicles(pool, vehicles, session)
 
             # Step 3: Show final statistics
             self._show_final_stats()
@@ -66,6 +85,20 @@ class ScrapingPipeline:
                 await browser.close()
             finally:
                 session.close()
+                close_thread_sessions()
+                # Let queued group files land before exporting
+                self.store.flush()
+                # Export whatever is in the DB, even after an interrupted run
+                if self.save_parquet:
+                    try:
+                        self.store.export_parquet()
+                    except Exception as e:
+                        logger.error(f"Parquet export failed: {e}")
+                if self.write_csv:
+                    try:
+                        self.store.export_csv()
+                    except Exception as e:
+                        logger.error(f"CSV export failed: {e}")
 
         logger.info("Pipeline completed successfully!")
 
@@ -75,83 +108,103 @@ class ScrapingPipeline:
         vehicles = await catalog.collect_vehicles(page, catalog_url)
         self.total_vehicles_seen = len(vehicles)
 
-        for vehicle in vehicles:
-            self.store.save_vehicle(vehicle)
+        self.store.save_vehicles(vehicles)
 
         logger.info(f"Saved {len(vehicles)} vehicles to database")
         return vehicles
 
-    async def _process_vehicles(self, page, vehicles: List[Vehicle], session):
+    async def _process_vehicles(self, pool: PagePool, vehicles: List[Vehicle],
+                                session):
         """Process all vehicles to extract parts data."""
         logger.info("=== Step 2: Processing Vehicles ===")
 
-        prev_model: Optional[
-            str] = None  # track previous to help detect stale DOM
-
+        # Vehicle-level completeness gate, decided up front with one query:
+        # vehicles whose groups are ALL 'done' (and not forcing) don't even load their aggregates.
+        completed = set(
+        ) if self.force_reprocess else self.store.load_completed_vehicle_ids()
+        todo = []
         for idx, vehicle in enumerate(vehicles, 1):
-            logger.info(
-                f"[{idx}/{len(vehicles)}] Vehicle: {vehicle.vehicle_name} ({vehicle.model_code})"
-            )
+            if vehicle.vehicle_id in completed:
+                logger.info(
+                    f"[{idx}/{len(vehicles)}] [skip vehicle done] {vehicle.vehicle_name} ({vehicle.model_code}) — all groups already done."
+                )
+                self._after_vehicle(vehicle_id=vehicle.vehicle_id)
+            else:
+                todo.append((idx, vehicle))
 
-            try:
-                # 2a) Collect Engine/Frame group indices for this vehicle
-                indices: List[TableIndex] = await aggregates.collect_indices(
-                    page, vehicle, prev_model_code=prev_model)
-
-                # --- DO NOT FILTER HERE ---
-                # No endswith(_model) filter, no dedupe, no slicing.
-
-                # Small debug to ensure counts match what aggregates reported
-                engine_count = sum(1 for x in indices
-                                   if x.group_type == "ENGINE")
-                frame_count = sum(1 for x in indices
-                                  if x.group_type == "FRAME")
+        # Aggregates for a batch of vehicles are collected concurrently (one pooled page each)
+        for start in range(0, len(todo), pool.size):
+            batch = todo[start:start + pool.size]
+            batch_indices = await aggregates.collect_indices_batch(
+                pool, [vehicle for _, vehicle in batch])
+
+            for (idx, vehicle), indices in zip(batch, batch_indices):
                 logger.info(
-                    f"[debug] indices raw from aggregates: total={len(indices)} (ENGINE={engine_count}, FRAME={frame_count})"
+                    f"[{idx}/{len(vehicles)}] Vehicle: {vehicle.vehicle_name} ({vehicle.model_code})"
                 )
+                await self._process_vehicle(pool, vehicle, session, indices)
 
-                if not indices:
-                    logger.warning(
-                        f"No Engine/Frame groups found for vehicle: {vehicle.vehicle_name}"
-                    )
-                    prev_model = vehicle.model_code
-                    # milestone tracking even if skipped due to 0 indices
-                    self._after_vehicle(vehicle_id=vehicle.vehicle_id)
-                    continue
+    async def _process_vehicle(
+            self, pool: PagePool, vehicle: Vehicle, session,
+            indices: Union[List[TableIndex], BaseException]) -> None:
+        """Scrape every group of one vehicle, several at once on pooled pages."""
+        try:
+            # 2a) Engine/Frame group indices for this vehicle (collected by the batch above)
+            if isinstance(indices, BaseException):
+                raise indices
 
-                # Vehicle-level completeness gate:
-                # If ALL groups for this vehicle are already 'done' (and not forcing), skip whole vehicle.
-                if not self.force_reprocess and self.store.is_vehicle_complete(
-                        vehicle.vehicle_id, expected_groups=len(indices)):
-                    logger.info(
-                        f"[skip vehicle done] {vehicle.vehicle_name} ({vehicle.model_code}) — all {len(indices)} groups already done."
-                    )
-                    prev_model = vehicle.model_code
-                    self._after_vehicle(vehicle_id=vehicle.vehicle_id)
-                    continue
+            # --- DO NOT FILTER HERE ---
+            # No endswith(_model) filter, no dedupe, no slicing.
 
-                self.total_groups_seen += len(indices)
-                logger.info(
-                    f"Found {len(indices)} groups for {vehicle.vehicle_name}")
+            # Small debug to ensure counts match what aggregates reported
+            counts = {"ENGINE": 0, "FRAME": 0}
+            for x in indices:
+                counts[x.group_type] = counts.get(x.group_type, 0) + 1
+            logger.info(
+                f"[debug] indices raw from aggregates: total={len(indices)} (ENGINE={counts['ENGINE']}, FRAME={counts['FRAME']})"
+            )
 
-                # 2b) Iterate each group exactly as returned
-                for j, ti in enumerate(indices, 1):
-                    key = (vehicle.vehicle_id, ti.group_type, ti.table_no,
-                           ti.group_code)
-                    pretty = f"{vehicle.vehicle_name} | {ti.group_type} | {ti.table_no} | {ti.group_code}"
+            if not indices:
+                logger.warning(
+                    f"No Engine/Frame groups found for vehicle: {vehicle.vehicle_name}"
+                )
+                # milestone tracking even if skipped due to 0 indices
+                self._after_vehicle(vehicle_id=vehicle.vehicle_id)
+                return
 
-                    status = self._checkpoint_status(key)
-                    if status == "done" and not self.force_reprocess:
-                        self.total_groups_skipped += 1
-                        logger.info(f"  - [skip done] {pretty}")
-                        continue
+            self.total_groups_seen += len(indices)
+            logger.info(
+                f"Found {len(indices)} groups for {vehicle.vehicle_name}")
+
+            # 2b) Pick the groups still to do, in the order returned
+            keys = [(vehicle.vehicle_id, ti.group_type, ti.table_no,
+                     ti.group_code) for ti in indices]
+            statuses = self._checkpoint_status_many(keys)
+            todo = []
+            for j, (ti, key) in enumerate(zip(indices, keys), 1):
+                pretty = f"{vehicle.vehicle_name} | {ti.group_type} | {ti.table_no} | {ti.group_code}"
+
+                status = statuses.get(key)
+                if status == "done" and not self.force_reprocess:
+                    self.total_groups_skipped += 1
+                    logger.info(f"  - [skip done] {pretty}")
+                    continue
+                todo.append((j, ti, key, pretty))
 
-                    # mark pending early (so resume-incomplete can find it if we crash)
-                    self._checkpoint_mark_pending(key)
+            # mark pending early (so resume-incomplete can find it if we crash)
+            self._checkpoint_mark_pending_many([key for _, _, key, _ in todo])
 
-                    logger.info(f"  - [{j}/{len(indices)}] Scraping: {pretty}")
+            # 2c) Scrape them concurrently, each group on its own pooled page
+            sem = asyncio.Semaphore(config.MAX_CONCURRENT_GROUPS)
 
+            async def scrape_group(j: int, ti: TableIndex, key, pretty: str):
+                async with sem, pool.acquire() as page:
+                    logger.info(
+                        f"  - [{j}/{len(indices)}] Scraping: {pretty}")
                     try:
+                        # The pooled page may still show another vehicle's aggregates
+                        await aggregates.ensure_group_loaded(page, vehicle, ti)
+
                         # Scrape parts page
                         parts_page, part_rows, image_saved = await parts.collect_parts(
                             page=page,
@@ -169,7 +222,6 @@ class ScrapingPipeline:
                                 table_index=ti,
                                 parts_page=parts_page,
                                 part_rows=part_rows,
-                                write_csv=True,
                                 save_parquet=self.save_parquet,
                             )
                             self.total_parts_rows += len(part_rows)
@@ -194,15 +246,23 @@ class ScrapingPipeline:
                         logger.exception(
                             f"    ✗ error scraping group: {pretty} :: {e}")
 
-            except Exception as e:
-                logger.exception(
-                    f"Failed processing vehicle '{vehicle.vehicle_name}': {e}")
+            # Failures outside scrape_group's own try (e.g. acquiring a page) must not
+            # abandon the sibling groups mid-write; record them once everything settles.
+            results = await asyncio.gather(
+                *(scrape_group(*t) for t in todo), return_exceptions=True)
+            for (_, _, key, pretty), result in zip(todo, results):
+                if isinstance(result, BaseException):
+                    self._checkpoint_mark_error(key, str(result))
+                    self.total_groups_failed += 1
+                    logger.error(
+                        f"    ✗ error scraping group: {pretty} :: {result!r}")
 
-            # update previous model for the next iteration
-            prev_model = vehicle.model_code
+        except Exception as e:
+            logger.exception(
+                f"Failed processing vehicle '{vehicle.vehicle_name}': {e}")
 
-            # milestone / progress record every N vehicles
-            self._after_vehicle(vehicle_id=vehicle.vehicle_id)
+        # milestone / progress record every N vehicles
+        self._after_vehicle(vehicle_id=vehicle.vehicle_id)
 
     # ----------------- small wrappers around store.py --------------------
 
@@ -229,6 +289,18 @@ class ScrapingPipeline:
             return self.store.get_checkpoint_status(key)
         return None
 
+    def _checkpoint_status_many(
+        self, keys: List[Tuple[str, str, str, str]]
+    ) -> Dict[Tuple[str, str, str, str], str]:
+        if hasattr(self.store, "checkpoint_status_many"):
+            return self.store.checkpoint_status_many(keys)
+        statuses = {}
+        for key in keys:
+            status = self._checkpoint_status(key)
+            if status is not None:
+                statuses[key] = status
+        return statuses
+
     def _checkpoint_mark_done(self, key: Tuple[str, str, str, str],
                               row_count: int, image_saved: bool):
         if hasattr(self.store, "checkpoint_mark_done"):
@@ -251,6 +323,13 @@ class ScrapingPipeline:
         if hasattr(self.store, "checkpoint_mark_pending"):
             return self.store.checkpoint_mark_pending(key)
 
+    def _checkpoint_mark_pending_many(self, keys: List[Tuple[str, str, str,
+                                                            str]]):
+        if hasattr(self.store, "checkpoint_mark_pending_many"):
+            return self.store.checkpoint_mark_pending_many(keys)
+        for key in keys:
+            self._checkpoint_mark_pending(key)
+
     def _show_final_stats(self):
         logger.info("=== Step 3: Final Statistics ===")
         logger.info(f"Vehicles seen         : {self.total_vehicles_seen}")
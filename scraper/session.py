@@ -1,9 +1,13 @@
 """HTTP session management with retry logic."""
+import asyncio
+import shutil
+import threading
+import orjson
 import requests
 import logging
 from pathlib import Path
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from typing import Optional
+from typing import List, Optional
 
 from . import config
 from .utils import get_file_extension_from_content_type
@@ -11,8 +15,12 @@ from .utils import get_file_extension_from_content_type
 logger = logging.getLogger(__name__)
 
 
-def make_session() -> requests.Session:
-    """Create a requests session with headers and retry configuration."""
+def make_session(warm_up: bool = False) -> requests.Session:
+    """Create a requests session with headers and retry configuration.
+
+    Args:
+        warm_up: HEAD config.BASE_URL once (see warm_up_session)
+    """
     session = requests.Session()
 
     # Set headers
@@ -40,27 +48,92 @@ def make_session() -> requests.Session:
         status_forcelist=[429, 500, 502, 503, 504],
         allowed_methods={"HEAD", "GET", "OPTIONS"},
         backoff_factor=config.RETRY_DELAY,
+        backoff_jitter=0.3,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand back the last response; raise_for_status() reports it
     )
 
+    # Download concurrency comes from one session per worker thread (see
+    # _thread_session), each fetching one image at a time: default pool sizes suffice
     adapter = HTTPAdapter(max_retries=retry_strategy)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
 
+    if warm_up:
+        warm_up_session(session)
+
     return session
 
 
+def warm_up_session(session: requests.Session) -> None:
+    """HEAD config.BASE_URL so DNS and a pooled connection are ready before the first download."""
+    if not config.BASE_URL:
+        return
+    try:
+        session.head(config.BASE_URL,
+                     timeout=config.REQUEST_TIMEOUT,
+                     allow_redirects=True)
+    except requests.RequestException as e:
+        logger.warning(f"Could not reach {config.BASE_URL}: {e}")
+
+
+# Every suffix get_file_extension_from_content_type can produce
+IMAGE_EXTENSIONS = (".jpg", ".png", ".svg", ".gif", ".webp", ".bmp", ".bin")
+
+
+def _meta_path(image_path: Path) -> Path:
+    return image_path.with_name(image_path.name + ".meta.json")
+
+
+def _find_existing_image(session: requests.Session, dst_path: Path,
+                         url: str) -> Optional[Path]:
+    """Return a previously downloaded, non-empty image for ``url`` at ``dst_path``, if any.
+
+    A file whose sidecar records a different URL or size does not count. With
+    IMAGE_REVALIDATE, a HEAD request must also report the recorded ETag.
+    """
+    for ext in IMAGE_EXTENSIONS:
+        candidate = dst_path.with_suffix(ext)
+        try:
+            size = candidate.stat().st_size
+        except OSError:
+            continue
+        if size == 0:
+            continue
+        try:
+            meta = orjson.loads(_meta_path(candidate).read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            meta = {}
+        if meta.get("url", url) != url or meta.get("length", size) != size:
+            continue
+        if config.IMAGE_REVALIDATE and meta.get("etag"):
+            try:
+                head = session.head(url,
+                                    timeout=config.REQUEST_TIMEOUT,
+                                    allow_redirects=True)
+                if head.ok and head.headers.get("ETag") != meta["etag"]:
+                    continue
+            except requests.RequestException:
+                pass  # can't revalidate; keep what we have
+        return candidate
+    return None
+
+
 @retry(stop=stop_after_attempt(config.MAX_RETRIES),
        wait=wait_exponential(multiplier=1, min=2, max=10),
        retry=retry_if_exception_type(
            (requests.RequestException, requests.Timeout)))
-def download_image(session: requests.Session, url: str,
-                   dst_path: Path) -> Optional[str]:
+def download_image(session: requests.Session,
+                   url: str,
+                   dst_path: Path,
+                   referer: Optional[str] = None) -> Optional[str]:
     """Download image from URL and save to destination path.
     
     Args:
         session: HTTP session
         url: Image URL
         dst_path: Destination directory path
+        referer: Page the image belongs to (overrides the session's Referer)
         
     Returns:
         Final file path if successful, None if failed
@@ -69,12 +142,19 @@ def download_image(session: requests.Session, url: str,
         logger.warning("Empty image URL provided")
         return None
 
+    existing = _find_existing_image(session, dst_path, url)
+    if existing is not None:
+        logger.debug("Image already downloaded, skipping: %s", existing)
+        return str(existing)
+
     try:
         logger.info(f"Downloading image: {url}")
 
-        response = session.get(url,
-                               timeout=config.REQUEST_TIMEOUT,
-                               stream=True)
+        response = session.get(
+            url,
+            timeout=config.REQUEST_TIMEOUT,
+            stream=True,
+            headers={'Referer': referer} if referer else None)
         response.raise_for_status()
 
         # Get content type and determine extension
@@ -87,11 +167,10 @@ def download_image(session: requests.Session, url: str,
         # Ensure parent directory exists
         final_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Write file
+        # Write file: copy the (decoded) raw stream in 1 MB blocks
+        response.raw.decode_content = True
         with open(final_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
+            shutil.copyfileobj(response.raw, f, length=1024 * 1024)
 
         file_size = final_path.stat().st_size
         if file_size == 0:
@@ -99,6 +178,18 @@ def download_image(session: requests.Session, url: str,
             final_path.unlink(missing_ok=True)
             return None
 
+        # Sidecar lets resumed runs skip this image (and optionally revalidate it)
+        try:
+            _meta_path(final_path).write_bytes(
+                orjson.dumps({
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "length": file_size,
+                    "ext": extension,
+                }))
+        except OSError as e:
+            logger.warning(f"Could not write image metadata for {final_path}: {e}")
+
         logger.info(f"Image saved: {final_path} ({file_size} bytes)")
         return str(final_path)
 
@@ -108,3 +199,53 @@ def download_image(session: requests.Session, url: str,
     except Exception as e:
         logger.error(f"Unexpected error downloading image {url}: {e}")
         return None
+
+
+# Worker threads each get their own Session: requests.Session isn't thread-safe.
+# Every one is registered so close_thread_sessions() can close them; bumping the
+# generation makes threads build a fresh session instead of reusing a closed one.
+_thread_state = threading.local()
+_thread_sessions: List[requests.Session] = []
+_thread_sessions_lock = threading.Lock()
+_thread_generation = 0
+
+
+def _thread_session(template: requests.Session) -> requests.Session:
+    """This thread's session, created (and warmed up) on first use with ``template``'s headers."""
+    session = getattr(_thread_state, "session", None)
+    if session is None or _thread_state.generation != _thread_generation:
+        session = make_session()
+        session.headers.update(template.headers)
+        warm_up_session(session)
+        with _thread_sessions_lock:
+            _thread_sessions.append(session)
+            _thread_state.generation = _thread_generation
+        _thread_state.session = session
+    return session
+
+
+def close_thread_sessions() -> None:
+    """Close every worker-thread session created by download_image_async."""
+    global _thread_generation
+    with _thread_sessions_lock:
+        _thread_generation += 1
+        sessions = list(_thread_sessions)
+        _thread_sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+async def download_image_async(session: requests.Session,
+                               url: str,
+                               dst_path: Path,
+                               referer: Optional[str] = None) -> Optional[str]:
+    """Awaitable download_image: runs the blocking download on a worker thread.
+
+    Keeps the event loop free for Playwright work on other pages while the
+    image is fetched and written. ``session`` is used as a template for the
+    worker thread's own session. Returns the same as download_image.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, lambda: download_image(_thread_session(session), url, dst_path,
+                                     referer))
@@ -1,35 +1,226 @@
 """Data storage management - SQLite checkpoints and CSV/Parquet output."""
+import atexit
+import csv
+import os
+import queue
 import sqlite3
 import logging
+import threading
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import starmap
 from pathlib import Path
-from typing import List, Optional, Tuple
+from urllib.parse import quote
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from . import config
 from .datamodel import Vehicle, TableIndex, PartsPage, PartRow, PART_ROW_HEADERS
 
 logger = logging.getLogger(__name__)
 
+PARTS_SCHEMA = pa.schema([(col, pa.string()) for col in PART_ROW_HEADERS])
+CSV_EXPORT_BATCH_ROWS = 10_000  # rows fetched from SQLite per csv.writer.writerows call
+
+# Hot-path statements. sqlite3 caches prepared statements keyed by the SQL
+# text, so each one is a single module-level string that is reused every call.
+_SQL_CHECKPOINT_STATUS = (
+    "SELECT status FROM checkpoints "
+    "WHERE vehicle_id=? AND group_type=? AND table_no=? AND group_code=?")
+
+_SQL_MARK_CHECKPOINTS = """
+    INSERT OR REPLACE INTO checkpoints
+    (vehicle_id, group_type, table_no, group_code, status, row_count, image_saved, last_error, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_SAVE_VEHICLE = """
+    INSERT OR REPLACE INTO vehicles
+    (vehicle_id, vehicle_name, model_code, source_url, created_at)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+_SQL_UPSERT_PARTS_PAGE = """
+    INSERT INTO parts_pages (vehicle_id, group_type, table_no, group_code, parts_page_url, image_path, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(vehicle_id, group_type, table_no, group_code)
+    DO UPDATE SET parts_page_url=excluded.parts_page_url,
+                  image_path=excluded.image_path,
+                  updated_at=excluded.updated_at
+"""
+
+_SQL_UPSERT_PARTS = """
+    INSERT INTO parts (
+      vehicle_id, vehicle_name, model_code, group_type, table_no, group_code, group_desc,
+      ref_no, part_no, description, remark, req_no, moq, mrp,
+      image_path, parts_page_url, source_url, ref_no_int, created_at
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(vehicle_id, group_type, table_no, group_code, ref_no, part_no)
+    DO UPDATE SET vehicle_name=excluded.vehicle_name,
+                  model_code=excluded.model_code,
+                  group_desc=excluded.group_desc,
+                  description=excluded.description,
+                  remark=excluded.remark,
+                  req_no=excluded.req_no,
+                  moq=excluded.moq,
+                  mrp=excluded.mrp,
+                  image_path=excluded.image_path,
+                  parts_page_url=excluded.parts_page_url,
+                  source_url=excluded.source_url
+    -- Re-scraped rows are usually identical: skip the row write, WAL append
+    -- and index update unless something actually changed
+    WHERE (parts.vehicle_name, parts.model_code, parts.group_desc,
+           parts.description, parts.remark, parts.req_no, parts.moq, parts.mrp,
+           parts.image_path, parts.parts_page_url, parts.source_url)
+          IS NOT
+          (excluded.vehicle_name, excluded.model_code, excluded.group_desc,
+           excluded.description, excluded.remark, excluded.req_no, excluded.moq,
+           excluded.mrp, excluded.image_path, excluded.parts_page_url,
+           excluded.source_url)
+"""
+
+# Full parts rows in PART_ROW_HEADERS order, vehicle fields filled from vehicles
+# (callers append the ORDER BY)
+_SQL_EXPORT_PARTS = """
+    SELECT p.vehicle_id,
+           COALESCE(NULLIF(p.vehicle_name, ''), v.vehicle_name, ''),
+           COALESCE(NULLIF(p.model_code, ''), v.model_code, ''),
+           p.group_type, p.table_no, p.group_code,
+           COALESCE(p.group_desc, ''),
+           p.ref_no, p.part_no, p.description, p.remark, p.req_no, p.moq, p.mrp,
+           p.image_path, p.parts_page_url,
+           COALESCE(NULLIF(p.source_url, ''), v.source_url, '')
+    FROM parts p LEFT JOIN vehicles v ON v.vehicle_id = p.vehicle_id
+"""
+
+_SQL_COUNT_GROUP = (
+    "SELECT COUNT(*) FROM parts "
+    "WHERE vehicle_id=? AND group_type=? AND table_no=? AND group_code=?")
+
+_SQL_FETCH_GROUP = """
+    SELECT vehicle_id, group_type, table_no, group_code,
+           ref_no, part_no, description, remark, req_no, moq, mrp,
+           image_path, parts_page_url, source_url
+    FROM parts
+    WHERE vehicle_id=? AND group_type=? AND table_no=? AND group_code=?
+    ORDER BY ref_no_int NULLS LAST, ref_no
+"""
+
+
+def _ref_no_int(ref_no: str) -> Optional[int]:
+    """Numeric sort key for a ref_no ('12' -> 12); None for blank/non-numeric.
+
+    ASCII digits only, matching the migration backfill's GLOB '*[^0-9]*' test
+    (str.isdigit alone also accepts '²' or '①', which int() rejects).
+    """
+    ref_no = ref_no.strip()
+    return int(ref_no) if ref_no.isascii() and ref_no.isdigit() else None
+
+
+def configure_sqlite(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Apply per-connection PRAGMAs: no fsync per commit, in-memory temp, 64 MB cache,
+    memory-mapped reads, a 5s wait (instead of an error) on a locked database,
+    and no automatic WAL checkpoints.
+
+    journal_mode=WAL is persistent in the file and is set once by DataStore._init_database.
+    """
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA mmap_size=10737418240")
+    conn.execute("PRAGMA busy_timeout=5000")
+    # WAL checkpoints run on DataStore's background thread, not inside a commit
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    return conn
+
 
 class DataStore:
     """Manages SQLite checkpoints and data output, plus deduped parts storage."""
 
     def __init__(self, sqlite_path: Path = None):
         self.sqlite_path = sqlite_path or config.SQLITE_PATH
+        self.sqlite_path.parent.mkdir(parents=True, exist_ok=True)
+        # One connection for the store's lifetime, shared across threads behind a lock
+        self._conn = self._connect()
+        self._lock = threading.RLock()
         self._init_database()
+        self._closed = threading.Event()
+        self._checkpointer = threading.Thread(target=self._checkpoint_wal_loop,
+                                              name="sqlite-wal-checkpoint",
+                                              daemon=True)
+        self._checkpointer.start()
+        # Group dataset files are written by one background thread, in submission order
+        self._writer_q: "queue.Queue[Optional[Tuple[Tuple[str, str, str, str], pa.Table]]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop,
+                                        name="parts-dataset-writer",
+                                        daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
 
     # --------------------------- DB INIT ---------------------------------
 
+    def _connect(self) -> sqlite3.Connection:
+        return configure_sqlite(
+            sqlite3.connect(self.sqlite_path,
+                            check_same_thread=False,
+                            cached_statements=512))
+
+    @contextmanager
+    def _db(self) -> Iterator[sqlite3.Connection]:
+        """Lock the shared connection; commit on success, roll back on error."""
+        with self._lock, self._conn:
+            yield self._conn
+
+    def checkpoint_wal(self, mode: str = "PASSIVE") -> Optional[Tuple[int, int, int]]:
+        """Fold the WAL back into the database; returns SQLite's (busy, log, checkpointed)."""
+        with self._lock:
+            if self._conn is None:
+                return None
+            busy, log, checkpointed = self._conn.execute(
+                f"PRAGMA wal_checkpoint({mode})").fetchone()
+        if busy:
+            logger.warning(
+                f"WAL checkpoint blocked: {checkpointed}/{log} frames checkpointed")
+        else:
+            logger.debug(f"WAL checkpoint: {checkpointed}/{log} frames checkpointed")
+        return busy, log, checkpointed
+
+    def _checkpoint_wal_loop(self):
+        while not self._closed.wait(config.WAL_CHECKPOINT_INTERVAL_S):
+            try:
+                self.checkpoint_wal()
+            except sqlite3.Error as e:
+                logger.warning(f"WAL checkpoint failed: {e}")
+
+    def close(self):
+        """Close the shared connection (idempotent; also runs at interpreter exit)."""
+        if self._writer.is_alive():
+            self.flush()
+            self._writer_q.put(None)
+            self._writer.join()
+        self._closed.set()
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                except sqlite3.Error as e:
+                    logger.warning(f"Final WAL checkpoint failed: {e}")
+                self._conn.close()
+                self._conn = None
+
     def _init_database(self):
         """Initialize SQLite database with required tables and migrate if needed."""
-        self.sqlite_path.parent.mkdir(parents=True, exist_ok=True)
 
         def column_names(conn, table):
             cur = conn.execute(f"PRAGMA table_info({table})")
             return [r[1] for r in cur.fetchall()]
 
-        with sqlite3.connect(self.sqlite_path) as conn:
+        with self._db() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+
             # --- checkpoints ---
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS checkpoints (
@@ -113,7 +304,8 @@ class DataStore:
                   parts_page_url TEXT,
                   image_path     TEXT,
                   source_url     TEXT,
-                  created_at     TEXT
+                  created_at     TEXT,
+                  ref_no_int     INTEGER
                 )
             """)
             parts_cols = set(column_names(conn, "parts"))
@@ -127,10 +319,17 @@ class DataStore:
                 "image_path": "ALTER TABLE parts ADD COLUMN image_path TEXT",
                 "source_url": "ALTER TABLE parts ADD COLUMN source_url TEXT",
                 "created_at": "ALTER TABLE parts ADD COLUMN created_at TEXT",
+                "ref_no_int": "ALTER TABLE parts ADD COLUMN ref_no_int INTEGER",
             }
             for col, sql in add_map.items():
                 if col not in parts_cols:
                     conn.execute(sql)
+            if "ref_no_int" not in parts_cols:
+                # Backfill with the same rule as _ref_no_int (all-digit ref_no only)
+                conn.execute("""
+                    UPDATE parts SET ref_no_int = CAST(TRIM(ref_no) AS INTEGER)
+                    WHERE TRIM(ref_no) <> '' AND TRIM(ref_no) NOT GLOB '*[^0-9]*'
+                """)
 
             # Unique constraint for idempotent upserts
             conn.execute("""
@@ -138,12 +337,21 @@ class DataStore:
                 ON parts (vehicle_id, group_type, table_no, group_code, ref_no, part_no)
             """)
 
+            # Group reads in display order (_fetch_group_rows) straight off the index, no sort
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS parts_group_order
+                ON parts (vehicle_id, group_type, table_no, group_code, ref_no_int, ref_no)
+            """)
+
+            # Redundant: parts_group_order already serves WHERE vehicle_id=? lookups
+            conn.execute("DROP INDEX IF EXISTS idx_parts_veh_group")
+
             conn.commit()
 
     # ----------------------- MILESTONES / META ---------------------------
 
     def mark_milestone(self, batch_no: int, upto_vehicle_id: str):
-        with sqlite3.connect(self.sqlite_path) as conn:
+        with self._db() as conn:
             conn.execute(
                 "INSERT INTO milestones (batch_no, upto_vehicle_id, created_at) VALUES (?, ?, ?)",
                 (batch_no, upto_vehicle_id, datetime.now().isoformat()),
@@ -151,7 +359,7 @@ class DataStore:
             conn.commit()
 
     def get_vehicle_group_status_counts(self, vehicle_id: str) -> dict:
-        with sqlite3.connect(self.sqlite_path) as conn:
+        with self._db() as conn:
             cur = conn.cursor()
             cur.execute(
                 """
@@ -165,7 +373,7 @@ class DataStore:
     def is_vehicle_complete(self, vehicle_id: str,
                             expected_groups: int) -> bool:
         """True if exactly expected_groups checkpoints exist and all are 'done'."""
-        with sqlite3.connect(self.sqlite_path) as conn:
+        with self._db() as conn:
             cur = conn.cursor()
             cur.execute(
                 """
@@ -181,34 +389,70 @@ class DataStore:
 
         return (total == expected_groups) and (done == expected_groups)
 
+    def load_completed_vehicle_ids(self) -> Set[str]:
+        """Vehicles whose every checkpoint is 'done' (one query for the whole run).
+
+        Pending checkpoints are written for all of a vehicle's groups before any
+        is scraped, so a partly scraped vehicle never qualifies.
+        """
+        with self._db() as conn:
+            rows = conn.execute("""
+                SELECT vehicle_id FROM checkpoints
+                GROUP BY vehicle_id
+                HAVING COUNT(*) > 0 AND SUM(status = 'done') = COUNT(*)
+            """).fetchall()
+        return {vehicle_id for (vehicle_id, ) in rows}
+
     # ----------------------- CHECKPOINTS ---------------------------------
 
     def checkpoint_status(self, key: Tuple[str, str, str,
                                            str]) -> Optional[str]:
         """Get checkpoint status for (vehicle_id, group_type, table_no, group_code)."""
-        vehicle_id, group_type, table_no, group_code = key
-        with sqlite3.connect(self.sqlite_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT status FROM checkpoints WHERE vehicle_id=? AND group_type=? AND table_no=? AND group_code=?",
-                (vehicle_id, group_type, table_no, group_code),
-            )
-            result = cursor.fetchone()
-            return result[0] if result else None
+        with self._db() as conn:
+            result = conn.execute(_SQL_CHECKPOINT_STATUS, tuple(key)).fetchone()
+        return result[0] if result else None
+
+    def checkpoint_status_many(
+        self, keys: Iterable[Tuple[str, str, str, str]]
+    ) -> Dict[Tuple[str, str, str, str], str]:
+        """Statuses for many checkpoint keys in one query per chunk; missing keys are absent."""
+        keys = list(keys)
+        statuses = {}
+        with self._db() as conn:
+            # 200 keys = 800 bound parameters, under SQLite's historical 999 limit
+            for start in range(0, len(keys), 200):
+                chunk = keys[start:start + 200]
+                values = ", ".join(["(?, ?, ?, ?)"] * len(chunk))
+                cur = conn.execute(
+                    "SELECT vehicle_id, group_type, table_no, group_code, status "
+                    "FROM checkpoints "
+                    "WHERE (vehicle_id, group_type, table_no, group_code) "
+                    f"IN (VALUES {values})",
+                    [part for key in chunk for part in key])
+                for vehicle_id, group_type, table_no, group_code, status in cur:
+                    statuses[(vehicle_id, group_type, table_no,
+                              group_code)] = status
+        return statuses
+
+    def bulk_mark(self, status: str,
+                  entries: Iterable[Tuple[Tuple[str, str, str, str],
+                                          Optional[int], bool, Optional[str]]]):
+        """Write many checkpoints with one status in a single transaction.
+
+        Each entry is (key, row_count, image_saved, last_error).
+        """
+        now = datetime.now().isoformat()
+        rows = [(*key, status, row_count, int(image_saved), last_error, now)
+                for key, row_count, image_saved, last_error in entries]
+        if not rows:
+            return
+        with self._db() as conn:
+            conn.executemany(_SQL_MARK_CHECKPOINTS, rows)
 
     def checkpoint_mark_done(self, key: Tuple[str, str, str, str],
                              row_count: int, image_saved: bool):
         """Mark checkpoint as done."""
-        vehicle_id, group_type, table_no, group_code = key
-        with sqlite3.connect(self.sqlite_path) as conn:
-            conn.execute(
-                """
-                INSERT OR REPLACE INTO checkpoints
-                (vehicle_id, group_type, table_no, group_code, status, row_count, image_saved, last_error, updated_at)
-                VALUES (?, ?, ?, ?, 'done', ?, ?, NULL, ?)
-            """, (vehicle_id, group_type, table_no, group_code, row_count,
-                  int(image_saved), datetime.now().isoformat()))
-            conn.commit()
+        self.bulk_mark('done', [(key, row_count, image_saved, None)])
         logger.info(
             f"Checkpoint marked done: {key} ({row_count} rows, image_saved={image_saved})"
         )
@@ -216,60 +460,48 @@ class DataStore:
     def checkpoint_mark_error(self, key: Tuple[str, str, str, str],
                               error: str):
         """Mark checkpoint as error."""
-        vehicle_id, group_type, table_no, group_code = key
-        with sqlite3.connect(self.sqlite_path) as conn:
-            conn.execute(
-                """
-                INSERT OR REPLACE INTO checkpoints
-                (vehicle_id, group_type, table_no, group_code, status, row_count, image_saved, last_error, updated_at)
-                VALUES (?, ?, ?, ?, 'error', NULL, 0, ?, ?)
-            """, (vehicle_id, group_type, table_no, group_code, error,
-                  datetime.now().isoformat()))
-            conn.commit()
+        self.bulk_mark('error', [(key, None, False, error)])
         logger.error(f"Checkpoint marked error: {key} - {error}")
 
     def checkpoint_mark_pending(self, key: Tuple[str, str, str, str]):
         """Mark checkpoint as pending."""
-        vehicle_id, group_type, table_no, group_code = key
-        with sqlite3.connect(self.sqlite_path) as conn:
-            conn.execute(
-                """
-                INSERT OR REPLACE INTO checkpoints
-                (vehicle_id, group_type, table_no, group_code, status, row_count, image_saved, last_error, updated_at)
-                VALUES (?, ?, ?, ?, 'pending', NULL, 0, NULL, ?)
-            """, (vehicle_id, group_type, table_no, group_code,
-                  datetime.now().isoformat()))
-            conn.commit()
+        self.checkpoint_mark_pending_many([key])
+
+    def checkpoint_mark_pending_many(self, keys: Iterable[Tuple[str, str, str,
+                                                               str]]):
+        """Mark several checkpoints as pending in one transaction."""
+        self.bulk_mark('pending', [(key, None, False, None) for key in keys])
 
     # ----------------------- VEHICLES -----------------------------------
 
     def save_vehicle(self, vehicle: Vehicle):
         """Save vehicle to database."""
-        with sqlite3.connect(self.sqlite_path) as conn:
-            conn.execute(
-                """
-                INSERT OR REPLACE INTO vehicles
-                (vehicle_id, vehicle_name, model_code, source_url, created_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, (vehicle.vehicle_id, vehicle.vehicle_name, vehicle.model_code,
-                  vehicle.source_url, datetime.now().isoformat()))
+        with self._db() as conn:
+            conn.execute(_SQL_SAVE_VEHICLE,
+                         (vehicle.vehicle_id, vehicle.vehicle_name,
+                          vehicle.model_code, vehicle.source_url,
+                          datetime.now().isoformat()))
+            conn.commit()
+
+    def save_vehicles(self, vehicles: List[Vehicle]):
+        """Save many vehicles in one transaction."""
+        now = datetime.now().isoformat()
+        with self._db() as conn:
+            conn.executemany(_SQL_SAVE_VEHICLE,
+                             [(v.vehicle_id, v.vehicle_name, v.model_code,
+                               v.source_url, now) for v in vehicles])
             conn.commit()
 
     def get_vehicles(self) -> List[Vehicle]:
         """Get all saved vehicles."""
-        with sqlite3.connect(self.sqlite_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT vehicle_id, vehicle_name, model_code, source_url FROM vehicles"
-            )
-            vehicles = []
-            for row in cursor.fetchall():
-                vehicles.append(
-                    Vehicle(vehicle_id=row[0],
-                            vehicle_name=row[1],
-                            model_code=row[2],
-                            source_url=row[3]))
-            return vehicles
+        with self._db() as conn:
+            # Columns in Vehicle's field order, so each row maps straight onto its __init__
+            return list(
+                starmap(
+                    Vehicle,
+                    conn.execute(
+                        "SELECT vehicle_id, vehicle_name, model_code, source_url FROM vehicles"
+                    )))
 
     # ------------------- UPSERT PARTS & PAGES ---------------------------
 
@@ -278,122 +510,117 @@ class DataStore:
         return self.upsert_parts_page(parts_page)
 
     def upsert_parts_page(self, parts_page: PartsPage):
-        with sqlite3.connect(self.sqlite_path) as conn:
-            conn.execute(
-                """
-                INSERT INTO parts_pages (vehicle_id, group_type, table_no, group_code, parts_page_url, image_path, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(vehicle_id, group_type, table_no, group_code)
-                DO UPDATE SET parts_page_url=excluded.parts_page_url,
-                              image_path=excluded.image_path,
-                              updated_at=excluded.updated_at
-            """, (parts_page.vehicle_id, parts_page.group_type,
-                  parts_page.table_no, parts_page.group_code,
-                  parts_page.parts_page_url, parts_page.image_path or '',
-                  datetime.now().isoformat()))
+        with self._db() as conn:
+            conn.execute(_SQL_UPSERT_PARTS_PAGE,
+                         (parts_page.vehicle_id, parts_page.group_type,
+                          parts_page.table_no, parts_page.group_code,
+                          parts_page.parts_page_url, parts_page.image_path or '',
+                          datetime.now().isoformat()))
             conn.commit()
 
     def upsert_part_rows(self, dict_rows: List[dict]) -> int:
         """UPSERT many part rows; returns count submitted (duplicates ignored)."""
         if not dict_rows:
             return 0
-        with sqlite3.connect(self.sqlite_path) as conn:
+        now = datetime.now().isoformat()  # one timestamp for the whole batch
+        with self._db() as conn:
             conn.executemany(
-                """
-                INSERT INTO parts (
-                  vehicle_id, group_type, table_no, group_code,
-                  ref_no, part_no, description, remark, req_no, moq, mrp,
-                  image_path, parts_page_url, source_url
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(vehicle_id, group_type, table_no, group_code, ref_no, part_no)
-                DO UPDATE SET description=excluded.description,
-                              remark=excluded.remark,
-                              req_no=excluded.req_no,
-                              moq=excluded.moq,
-                              mrp=excluded.mrp,
-                              image_path=excluded.image_path,
-                              parts_page_url=excluded.parts_page_url,
-                              source_url=excluded.source_url
-            """, [(d['vehicle_id'], d['group_type'], d['table_no'],
-                   d['group_code'], d.get('ref_no', ''), d.get(
-                       'part_no', ''), d.get('description', ''),
-                   d.get('remark', ''), d.get('req_no', ''), d.get(
-                       'moq', ''), d.get('mrp', ''), d.get('image_path', ''),
-                   d.get('parts_page_url', ''), d.get('source_url', ''))
-                  for d in dict_rows])
+                _SQL_UPSERT_PARTS,
+                [(d['vehicle_id'], d.get('vehicle_name', ''),
+                  d.get('model_code', ''), d['group_type'], d['table_no'],
+                  d['group_code'], d.get('group_desc', ''), d.get('ref_no', ''),
+                  d.get('part_no', ''), d.get('description', ''),
+                  d.get('remark', ''), d.get('req_no', ''), d.get('moq', ''),
+                  d.get('mrp', ''), d.get('image_path', ''),
+                  d.get('parts_page_url', ''), d.get('source_url', ''),
+                  _ref_no_int(d.get('ref_no', '')), now)
+                 for d in dict_rows])
             conn.commit()
         return len(dict_rows)
 
     # ---------------- CSV / Parquet (group-scoped write) ----------------
 
-    def _fetch_group_df(self, vehicle_id: str, group_type: str, table_no: str,
-                        group_code: str) -> pd.DataFrame:
-        """Read the canonical rows for a group from SQLite."""
-        with sqlite3.connect(self.sqlite_path) as conn:
-            df = pd.read_sql_query("""
-                SELECT vehicle_id, group_type, table_no, group_code,
-                       ref_no, part_no, description, remark, req_no, moq, mrp,
-                       image_path, parts_page_url, source_url
-                FROM parts
-                WHERE vehicle_id=? AND group_type=? AND table_no=? AND group_code=?
-                ORDER BY CAST(NULLIF(ref_no, '') AS INT) NULLS LAST, ref_no
-            """,
-                                   conn,
-                                   params=(vehicle_id, group_type, table_no,
-                                           group_code))
-        # Ensure column order matches schema used elsewhere
-        df = df.reindex(columns=[
-            'vehicle_id', 'group_type', 'table_no', 'group_code', 'ref_no',
-            'part_no', 'description', 'remark', 'req_no', 'moq', 'mrp',
-            'image_path', 'parts_page_url', 'source_url'
-        ])
-        return df
-
-    def _overwrite_group_in_csv(self, df_group: pd.DataFrame):
-        """Write/refresh a group's rows into the CSV without creating duplicates."""
-        config.CSV_OUTPUT.parent.mkdir(parents=True, exist_ok=True)
-        if config.CSV_OUTPUT.exists():
-            existing_path = config.CSV_OUTPUT
-        else:
-            existing_path = config.CSV_OUTPUT
-
-        if existing_path.exists():
-            existing = pd.read_csv(existing_path, dtype=str).fillna('')
-            mask = ((existing['vehicle_id'] == df_group['vehicle_id'].iloc[0])
-                    &
-                    (existing['group_type'] == df_group['group_type'].iloc[0])
-                    & (existing['table_no'] == df_group['table_no'].iloc[0]) &
-                    (existing['group_code'] == df_group['group_code'].iloc[0]))
-            existing = existing.loc[~mask]
-            out = pd.concat([existing, df_group], ignore_index=True)
-        else:
-            out = df_group
-        # Stable column order (attempt to include richer schema if present)
-        desired_cols = [
-            'vehicle_id', 'vehicle_name', 'model_code', 'group_type',
-            'table_no', 'group_code', 'group_desc', 'ref_no', 'part_no',
-            'description', 'remark', 'req_no', 'moq', 'mrp', 'image_path',
-            'parts_page_url', 'source_url'
-        ]
-        if set(desired_cols).issubset(out.columns):
-            out = out[desired_cols]
-        out.to_csv(existing_path, index=False)
-
-    def _overwrite_group_in_parquet(self, df_group: pd.DataFrame):
-        config.PARQUET_OUTPUT.parent.mkdir(parents=True, exist_ok=True)
-        try:
-            existing = pd.read_parquet(config.PARQUET_OUTPUT)
-            mask = ((existing['vehicle_id'] == df_group['vehicle_id'].iloc[0])
-                    &
-                    (existing['group_type'] == df_group['group_type'].iloc[0])
-                    & (existing['table_no'] == df_group['table_no'].iloc[0]) &
-                    (existing['group_code'] == df_group['group_code'].iloc[0]))
-            existing = existing.loc[~mask]
-            out = pd.concat([existing, df_group], ignore_index=True)
-        except Exception:
-            out = df_group
-        out.to_parquet(config.PARQUET_OUTPUT, index=False)
+    def _count_group(self, vehicle_id: str, group_type: str, table_no: str,
+                     group_code: str) -> int:
+        """Number of stored rows for a group (answered from the index)."""
+        with self._db() as conn:
+            return conn.execute(
+                _SQL_COUNT_GROUP,
+                (vehicle_id, group_type, table_no, group_code)).fetchone()[0]
+
+    def _fetch_group_rows(self, vehicle_id: str, group_type: str, table_no: str,
+                          group_code: str) -> List[dict]:
+        """Read the canonical rows for a group from SQLite, in display order."""
+        with self._db() as conn:
+            cur = conn.execute(_SQL_FETCH_GROUP,
+                               (vehicle_id, group_type, table_no, group_code))
+            columns = [c[0] for c in cur.description]
+            return [dict(zip(columns, row)) for row in cur]
+
+    def _group_dataset_path(self, vehicle_id: str, group_type: str,
+                            table_no: str, group_code: str) -> Path:
+        """<dataset>/<vehicle_id>/<group_type>/<table_no>/<group_code>.parquet (segments URL-quoted)."""
+        return config.PARQUET_DATASET_DIR.joinpath(
+            *(quote(part, safe='')
+              for part in (vehicle_id, group_type, table_no))).joinpath(
+                  quote(group_code, safe='') + ".parquet")
+
+    def _write_group_dataset(self, group_key: Tuple[str, str, str, str],
+                             table: pa.Table):
+        """Replace this group's file in the Parquet dataset with ``table``.
+
+        Only the group's own file is written; nothing else in the dataset is read.
+        """
+        path = self._group_dataset_path(*group_key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        pq.write_table(table, tmp_path, compression='zstd', use_dictionary=True)
+        os.replace(tmp_path, path)
+
+    def _writer_loop(self):
+        while True:
+            item = self._writer_q.get()
+            try:
+                if item is None:
+                    return
+                self._write_group_dataset(*item)
+            except Exception as e:
+                logger.error(
+                    f"Could not write dataset file for group {item[0]}: {e}")
+            finally:
+                self._writer_q.task_done()
+
+    def flush(self):
+        """Block until every queued group has been written to the Parquet dataset."""
+        self._writer_q.join()
+
+    def export_csv(self, path: Path = None) -> int:
+        """Write the canonical parts table to one CSV file (once, at the end of a run).
+
+        Rows come out grouped and in display order (walking the parts_group_order
+        index) and are streamed into csv.writer; the file is swapped in atomically.
+        """
+        path = Path(path or config.CSV_OUTPUT)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        total = 0
+        with self._db() as conn, open(tmp_path, 'w', newline='',
+                                      encoding='utf-8') as f:
+            cur = conn.execute(_SQL_EXPORT_PARTS + """
+                ORDER BY p.vehicle_id, p.group_type, p.table_no, p.group_code,
+                         p.ref_no_int NULLS LAST, p.ref_no
+            """)
+            writer = csv.writer(f)
+            writer.writerow(PART_ROW_HEADERS)
+            while True:
+                rows = cur.fetchmany(CSV_EXPORT_BATCH_ROWS)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                total += len(rows)
+        os.replace(tmp_path, path)
+        logger.info(f"Exported {total} parts rows to CSV: {path}")
+        return total
 
     # Public API used by pipeline after each table:
     def append_parts_rows(
@@ -402,12 +629,13 @@ class DataStore:
         table_index: TableIndex,
         parts_page: PartsPage,
         part_rows: List[PartRow],
-        write_csv: bool = True,
-        save_parquet: bool = False,
+        save_parquet: bool = True,
     ) -> int:
         """
-        UPSERT part rows for a group and immediately write that group's rows to CSV (and Parquet if requested),
-        replacing previous rows for the group to avoid duplicates on re-runs.
+        UPSERT part rows for a group and, if save_parquet, queue that group's rows for its
+        file in the Parquet dataset, replacing previous rows for the group to avoid duplicates
+        on re-runs. The single-file Parquet (export_parquet) and the CSV (export_csv) are
+        produced at end of run.
         """
         if not part_rows:
             return 0
@@ -418,52 +646,74 @@ class DataStore:
 
         # UPSERT into DB (dedup canonical storage)
         upserted = self.upsert_part_rows(dict_rows)
+        if not save_parquet:
+            return upserted
+
+        # If the group now holds exactly these rows (no stale rows from an earlier
+        # scrape, no duplicate keys in this one), the DB matches dict_rows: skip re-reading it
+        group_key = (vehicle.vehicle_id, table_index.group_type,
+                     table_index.table_no, table_index.group_code)
+        distinct = len({(d['ref_no'], d['part_no']) for d in dict_rows})
+        if distinct == len(dict_rows) and self._count_group(
+                *group_key) == distinct:
+            group_rows = sorted(dict_rows,
+                                key=lambda d: (_ref_no_int(d['ref_no']) is None,
+                                               _ref_no_int(d['ref_no']) or 0,
+                                               d['ref_no']))
+        else:
+            # Re-fetch canonical rows for this group from DB (ensures we write exactly what's in DB),
+            # with vehicle & group_desc taken from this scrape
+            enrich = {
+                'vehicle_name': dict_rows[0].get('vehicle_name', vehicle.vehicle_name),
+                'model_code': dict_rows[0].get('model_code', vehicle.model_code),
+                'group_desc': dict_rows[0].get(
+                    'group_desc', getattr(table_index, 'group_desc', '')),
+            }
+            group_rows = [{**row, **enrich}
+                          for row in self._fetch_group_rows(*group_key)]
 
-        if write_csv or save_parquet:
-            # Re-fetch canonical rows for this group from DB (ensures we write exactly what's in DB)
-            df_group = self._fetch_group_df(vehicle.vehicle_id,
-                                            table_index.group_type,
-                                            table_index.table_no,
-                                            table_index.group_code)
-
-            # Enrich with vehicle & group_desc if available in the converted dicts
-            if not df_group.empty:
-                vname = dict_rows[0].get('vehicle_name', vehicle.vehicle_name)
-                mcode = dict_rows[0].get('model_code', vehicle.model_code)
-                gdesc = dict_rows[0].get(
-                    'group_desc', getattr(table_index, 'group_desc', ''))
-                # insert at fixed positions if missing
-                if 'vehicle_name' not in df_group.columns:
-                    df_group.insert(1, 'vehicle_name', vname)
-                else:
-                    df_group['vehicle_name'] = vname
-                if 'model_code' not in df_group.columns:
-                    df_group.insert(2, 'model_code', mcode)
-                else:
-                    df_group['model_code'] = mcode
-                if 'group_desc' not in df_group.columns:
-                    df_group.insert(6, 'group_desc', gdesc)
-                else:
-                    df_group['group_desc'] = gdesc
-
-            if write_csv:
-                self._overwrite_group_in_csv(df_group)
-                logger.info(
-                    f"CSV updated for group {table_index.group_type} {table_index.table_no} ({len(df_group)} rows)"
-                )
-
-            if save_parquet:
-                self._overwrite_group_in_parquet(df_group)
-                logger.info(
-                    f"Parquet updated for group {table_index.group_type} {table_index.table_no} ({len(df_group)} rows)"
-                )
+        if group_rows:
+            # Straight to Arrow (no DataFrame); file I/O happens on the writer thread,
+            # call flush() before reading the dataset
+            table = pa.Table.from_pylist(group_rows, schema=PARTS_SCHEMA)
+            self._writer_q.put((group_key, table))
 
         return upserted
 
+    def export_parquet(self, path: Path = None) -> int:
+        """Stream the canonical parts table into a Parquet file, one row group per batch.
+
+        Memory stays bounded by config.PARQUET_ROW_GROUP_ROWS regardless of scrape size,
+        and the file is swapped in atomically so readers never see a partial write.
+        """
+        path = Path(path or config.PARQUET_OUTPUT)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+
+        total = 0
+        with self._db() as conn:
+            cur = conn.execute(_SQL_EXPORT_PARTS + " ORDER BY p.rowid")
+            with pq.ParquetWriter(tmp_path, PARTS_SCHEMA,
+                                  compression='snappy') as writer:
+                while True:
+                    rows = cur.fetchmany(config.PARQUET_ROW_GROUP_ROWS)
+                    if not rows:
+                        break
+                    columns = [
+                        pa.array(col, type=pa.string()) for col in zip(*rows)
+                    ]
+                    writer.write_batch(
+                        pa.RecordBatch.from_arrays(columns, schema=PARTS_SCHEMA))
+                    total += len(rows)
+
+        os.replace(tmp_path, path)
+        logger.info(f"Exported {total} parts rows to Parquet: {path}")
+        return total
+
     # --------------------- Legacy writers / helpers ----------------------
 
     def get_checkpoint_stats(self) -> dict:
-        with sqlite3.connect(self.sqlite_path) as conn:
+        with self._db() as conn:
             cursor = conn.cursor()
             stats = {}
             cursor.execute(
@@ -501,9 +751,13 @@ class DataStore:
         if append and config.PARQUET_OUTPUT.exists():
             existing_df = pd.read_parquet(config.PARQUET_OUTPUT)
             combined_df = pd.concat([existing_df, df], ignore_index=True)
-            combined_df.to_parquet(config.PARQUET_OUTPUT, index=False)
+            combined_df.to_parquet(config.PARQUET_OUTPUT,
+                                   index=False,
+                                   compression='snappy')
         else:
-            df.to_parquet(config.PARQUET_OUTPUT, index=False)
+            df.to_parquet(config.PARQUET_OUTPUT,
+                          index=False,
+                          compression='snappy')
         logger.info(
             f"Wrote {len(parts_data)} parts to Parquet: {config.PARQUET_OUTPUT}"
         )
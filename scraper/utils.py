@@ -2,12 +2,33 @@
 import re
 import asyncio
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Optional
 from slugify import slugify
 
-
+# onclick / DataTables patterns, compiled once at import
+_MODEL_RE = re.compile(r"loadModelAggregates\(\s*''\s*,\s*'([^']+)'\s*\)")
+_VARIANT_RE = re.compile(
+    r"updateBomDetails\(\s*'[^']*'\s*,\s*''\s*,\s*'([^']*)'\s*\)")
+_GROUP_RE = re.compile(r"updateBomDetails\(\s*'([^']+)'")
+_DT_INFO_RE = re.compile(r"of\s+(\d+)\s+entries", re.IGNORECASE)
+
+# Content-Type (lower-case, no parameters) -> file extension
+_EXT_MAP = MappingProxyType({
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/png": ".png",
+    "image/svg+xml": ".svg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/bmp": ".bmp"
+})
+
+
+@lru_cache(maxsize=4096)
 def slugify_name(name: str) -> str:
-    """Convert name to URL-safe slug."""
+    """Convert name to URL-safe slug (pure, so results are memoized)."""
     return slugify(name, max_length=50)
 
 
@@ -37,21 +58,19 @@ def parse_decimal(s: str) -> Optional[Decimal]:
 
 def extract_model_code(onclick: str) -> str:
     """Extract model code from loadModelAggregates onclick attribute."""
-    if not onclick:
+    if not onclick or "loadModelAggregates" not in onclick:
         return ""
 
-    pattern = r"loadModelAggregates\(\s*''\s*,\s*'([^']+)'\s*\)"
-    match = re.search(pattern, onclick)
+    match = _MODEL_RE.search(onclick)
     return match.group(1) if match else ""
 
 
 def extract_variant_from_update(onclick: str) -> Optional[str]:
     """Extract variant from updateBomDetails onclick attribute."""
-    if not onclick:
+    if not onclick or "updateBomDetails" not in onclick:
         return None
 
-    pattern = r"updateBomDetails\(\s*'[^']*'\s*,\s*''\s*,\s*'([^']*)'\s*\)"
-    match = re.search(pattern, onclick)
+    match = _VARIANT_RE.search(onclick)
 
     if match:
         variant = match.group(1).strip()
@@ -61,11 +80,10 @@ def extract_variant_from_update(onclick: str) -> Optional[str]:
 
 def extract_group_code_from_update(onclick: str) -> str:
     """Extract group code from updateBomDetails onclick attribute."""
-    if not onclick:
+    if not onclick or "updateBomDetails" not in onclick:
         return ""
 
-    pattern = r"updateBomDetails\(\s*'([^']+)'"
-    match = re.search(pattern, onclick)
+    match = _GROUP_RE.search(onclick)
     return match.group(1) if match else ""
 
 
@@ -86,19 +104,10 @@ def get_file_extension_from_content_type(content_type: str) -> str:
     if not content_type:
         return ".bin"
 
-    content_type = content_type.lower().split(';')[0].strip()
-
-    mapping = {
-        "image/jpeg": ".jpg",
-        "image/jpg": ".jpg",
-        "image/png": ".png",
-        "image/svg+xml": ".svg",
-        "image/gif": ".gif",
-        "image/webp": ".webp",
-        "image/bmp": ".bmp"
-    }
-
-    return mapping.get(content_type, ".bin")
+    ext = _EXT_MAP.get(content_type)  # already-normalized value, no parameters
+    if ext is None:
+        ext = _EXT_MAP.get(content_type.partition(';')[0].strip().lower(), ".bin")
+    return ext
 
 
 def parse_datatable_info(info_text: str) -> Optional[int]:
@@ -109,6 +118,5 @@ def parse_datatable_info(info_text: str) -> Optional[int]:
     if not info_text:
         return None
 
-    pattern = r"of\s+(\d+)\s+entries"
-    match = re.search(pattern, info_text, re.IGNORECASE)
+    match = _DT_INFO_RE.search(info_text)
     return int(match.group(1)) if match else None
@@ -1,19 +1,47 @@
 import pandas as pd
 
+CHUNK_ROWS = 200_000
+SAMPLE_VEHICLES = 3
+
+
+def _read_chunks(path):
+    """Only the columns we check, as categoricals, CHUNK_ROWS rows at a time."""
+    return pd.read_csv(path,
+                       usecols=['vehicle_name', 'model_code', 'group_code'],
+                       dtype='category',
+                       chunksize=CHUNK_ROWS)
+
 
 def verify_corrections():
-    original = pd.read_csv('data/csv/parts_master.csv')
-    corrected = pd.read_csv('data/csv/parts_master_corrected.csv')
+    original_vehicles = set()
+    for chunk in _read_chunks('data/csv/parts_master.csv'):
+        original_vehicles.update(chunk['vehicle_name'].dropna().unique())
+
+    # First few vehicles (in file order) -> model code and first group codes
+    corrected_vehicles = set()
+    samples = {}
+    for chunk in _read_chunks('data/csv/parts_master_corrected.csv'):
+        corrected_vehicles.update(chunk['vehicle_name'].dropna().unique())
+        chunk = chunk.dropna(subset=['vehicle_name']).drop_duplicates()
+        for vehicle, model_code, group_code in zip(chunk['vehicle_name'],
+                                                   chunk['model_code'],
+                                                   chunk['group_code']):
+            if vehicle not in samples:
+                if len(samples) == SAMPLE_VEHICLES:
+                    continue
+                samples[vehicle] = (model_code, [])
+            group_codes = samples[vehicle][1]
+            if len(group_codes) < 3 and group_code not in group_codes:
+                group_codes.append(group_code)
 
-    print("Original vehicles:", original['vehicle_name'].nunique())
-    print("Corrected vehicles:", corrected['vehicle_name'].nunique())
+    print("Original vehicles:", len(original_vehicles))
+    print("Corrected vehicles:", len(corrected_vehicles))
 
     # Check if group_codes now make sense for their assigned vehicles
-    for vehicle in corrected['vehicle_name'].unique()[:3]:
-        data = corrected[corrected['vehicle_name'] == vehicle]
+    for vehicle, (model_code, group_codes) in samples.items():
         print(f"\n{vehicle}:")
-        print(f"  Model code: {data['model_code'].iloc[0]}")
-        print(f"  Sample group codes: {data['group_code'].unique()[:3]}")
+        print(f"  Model code: {model_code}")
+        print(f"  Sample group codes: {group_codes}")
         # Group codes should now logically match the vehicle name
 
 if __name__ == "__main__":